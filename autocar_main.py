@@ -35,28 +35,60 @@ class GTKWarningFilter:
 # Apply filter to stderr
 sys.stderr = GTKWarningFilter(sys.stderr)
 
-import cv2
 import time
-import requests
 import base64
 import threading
 import http.server
 import socketserver
+import hmac
+import ipaddress
+import itertools
 import json
+import logging
+import logging.handlers
+import math
+import queue
+import re
+import socket
+import struct
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from pop import Util
 
-# Try to import pyttsx3 - handle Python version incompatibility gracefully
-try:
-    import pyttsx3
-    PYTTSX3_AVAILABLE = True
-except (ImportError, SyntaxError) as e:
-    # pyttsx3 requires Python 3.7+ (uses 'from __future__ import annotations')
-    # If running on Python 3.6 or earlier, TTS will be disabled
-    PYTTSX3_AVAILABLE = False
-    pyttsx3 = None
-    print(f"⚠ Warning: pyttsx3 not available (requires Python 3.7+): {str(e)}")
-    print(f"  TTS functionality will be disabled. Upgrade to Python 3.7+ to enable TTS.")
+PROCESS_START = time.time()  # Reference point for startup timings
+
+# Heavy modules are imported on first use (see load_cv2, load_requests and
+# warm_up_tts) so startup can run them in parallel with other work.
+cv2 = None
+np = None
+Util = None
+requests = None
+pyttsx3 = None
+PYTTSX3_AVAILABLE = False
+
+
+def load_cv2():
+    """Import OpenCV, numpy and the autocar camera helpers on first use."""
+    global cv2, np, Util
+    if cv2 is None:
+        import cv2 as cv2_module
+        import numpy as np_module
+        from pop import Util as util_module
+        Util = util_module
+        np = np_module
+        cv2 = cv2_module
+    return cv2
+
+
+def load_requests():
+    """Import requests on first use."""
+    global requests
+    if requests is None:
+        import requests as requests_module
+        requests = requests_module
+    return requests
+
 
 # ==================== CONFIGURATION ====================
 # PC Configuration
@@ -64,16 +96,384 @@ PC_IP = "192.168.56.1"  # PC IP address
 PC_WEBHOOK_PORT = 5000  # PC webhook port
 PC_WEBHOOK_URL = f"http://{PC_IP}:{PC_WEBHOOK_PORT}/webhook"
 
+# Transport to the PC: "http" (POST to PC_WEBHOOK_URL, PC POSTs back to /message)
+# or "tcp" (one persistent connection opened by the autocar; HTTP is still used
+# whenever that connection is down)
+PC_TRANSPORT = "http"
+PC_CHANNEL_PORT = 5002  # PC port for the persistent channel
+CHANNEL_HEARTBEAT_INTERVAL = 5  # Seconds of silence before sending a ping
+CHANNEL_TIMEOUT = 15  # Reconnect if nothing is heard from the PC for this long
+
 # Message Receiver Configuration
 MESSAGE_PORT = 5001  # Port for receiving messages from PC
 MESSAGE_HOST = "0.0.0.0"  # Listen on all interfaces
+MESSAGE_QUEUE_SIZE = 32  # Messages waiting for display/speech before the PC gets a 429
 
 # Face Detection Configuration
 SAVE_FOLDER = "captured_faces"  # Images saved here
 CAMERA_WIDTH = 640
 CAMERA_HEIGHT = 480
+CAMERA_FPS = 30  # Frame rate requested from the camera
+# Frame format delivered by the pipeline: "BGR" (color every frame), "GRAY8"
+# (gray only) or "I420" (gray plane for detection, color built only on capture)
+CAMERA_PIXEL_FORMAT = "I420"
+DETECT_SCALE = 1.0  # Shrink the detection image by this factor (e.g. 0.5)
+DETECT_SCALE_FACTOR = 1.3  # detectMultiScale scaleFactor
+DETECT_MIN_NEIGHBORS = 5  # detectMultiScale minNeighbors
+DETECT_MIN_SIZE = 100  # Smallest face in pixels at full resolution
+JPEG_QUALITY = 95  # Quality of saved and uploaded images (1-100)
+TARGET_FPS = 30  # Loop rate limit per camera (0 = as fast as frames arrive)
+CPU_BUDGET = 0  # Max share of a core the loop may keep busy, e.g. 0.5 (0 = no limit)
+# Best-frame selection: after the first detection, keep watching for this many
+# seconds and save only the sharpest, largest, most centered face (0 = first frame)
+SELECTION_WINDOW = 0.4
+SELECTION_SIZE_WEIGHT = 4.0  # How much a larger face raises the score
+HAAR_FACE_PATH = '/usr/local/share/opencv4/haarcascades/haarcascade_frontalface_default.xml'
+
+# Multi-Camera Configuration
+# One entry per camera. Keys left out use the settings above: name, width,
+# height, fps, pixel_format, detect_scale, capture_interval, selection_window.
+# "source" replaces the Util.gstrmer() pipeline with a V4L2 device index
+# (always BGR) or a GStreamer string. A string is used as written, without the
+# bounded appsink build_camera_pipeline() adds, and must say which format it
+# ends in with "pixel_format". Keys set here are not changed by PUT /config.
+CAMERA_SPECS = [
+    {'name': 'front'},
+    # {'name': 'rear', 'source': 1},
+    # {'name': 'usb', 'source': 'v4l2src device=/dev/video2 ! videoconvert ! '
+    #                            'video/x-raw, format=BGR ! appsink', 'pixel_format': 'BGR'},
+]
+DETECTOR_POOL_SIZE = 0  # Cascades shared by all cameras (0 = one per camera)
+FRAME_POOL_SIZE = 4  # Spare frame buffers kept for frames that outlive a loop iteration
+UPLOAD_QUEUE_SIZE = 10  # Captures waiting for upload before new ones are dropped
+CAMERA_STATS_INTERVAL = 10  # Seconds between per-camera FPS/drop reports
 CAPTURE_INTERVAL = 5  # Wait 5 seconds between captures
 
+# Camera Recovery Configuration
+CAMERA_MAX_READ_FAILURES = 5  # Consecutive failed reads before the pipeline is rebuilt
+CAMERA_STALL_TIMEOUT = 2.0  # A single read slower than this (seconds) counts as a stall
+CAMERA_RECONNECT_MIN_DELAY = 0.5  # First retry delay after the camera drops out
+CAMERA_RECONNECT_MAX_DELAY = 10.0  # Retry delay doubles up to this limit
+
+# Runtime Configuration
+# Settings changed through PUT /config are saved here and loaded at startup
+CONFIG_FILE = "autocar_config.json"
+# webhook_url decides where every face image goes, so only this machine may
+# change it, or another host sending this token in an X-Config-Token header
+CONFIG_TOKEN = ""
+
+# Latency Tracking Configuration
+LATENCY_HISTORY = 200  # Samples kept per hop for percentile reports
+LATENCY_MAX_PENDING = 50  # Captures still waiting for a reply from the PC
+
+# Event Log Configuration
+# Captures, uploads, messages and errors are written as one JSON object per
+# line by a background thread instead of being printed from the hot path
+EVENT_LOG_FILE = "autocar_events.ndjson"  # "" = no file, console summary only
+EVENT_LOG_MAX_BYTES = 5 * 1024 * 1024  # Rotate the file at this size
+EVENT_LOG_BACKUPS = 3  # Rotated files kept (autocar_events.ndjson.1, ...)
+EVENT_LOG_QUEUE_SIZE = 1000  # Events waiting for the writer before new ones are dropped
+EVENT_LOG_FLUSH_INTERVAL = 1.0  # Seconds between batched writes
+EVENT_SUMMARY_INTERVAL = 10  # Seconds between console summaries (0 = no summary)
+
+# ==================== EVENT LOG ====================
+class EventLog:
+    """Write structured events as NDJSON from a background thread."""
+    
+    def __init__(self, path=EVENT_LOG_FILE, max_size=EVENT_LOG_QUEUE_SIZE,
+                 flush_interval=EVENT_LOG_FLUSH_INTERVAL, summary_interval=EVENT_SUMMARY_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.summary_interval = summary_interval
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_size)
+        self._flush_at = max(1, max_size // 2)  # Wake the writer early at this many events
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._closed = False  # Set by stop(); the writer is never restarted after that
+        self._logger = None
+        # Per-event counts and the last error since the previous console summary
+        self._counts = {}
+        self._last_error = None
+        self._summary_dropped = 0
+        self._summary_since = time.time()
+    
+    def start(self):
+        """Open the log file and start the writer thread."""
+        with self._start_lock:  # The first events may come from several threads at once
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._worker, name="event-log", daemon=True)
+                self._thread.start()
+    
+    def stop(self, timeout=5.0):
+        """Write what is still queued, print a last summary and stop the thread for good."""
+        with self._start_lock:
+            self._closed = True
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+    
+    def log(self, event, **fields):
+        """
+        Queue an event for the writer thread. Never blocks.
+        
+        Durations are passed as '<name>_ms' fields; an 'error' field marks
+        the event as an error in the console summary.
+        
+        Returns:
+            bool: False if the event was dropped because the queue is full
+            or the log has been stopped
+        """
+        if self._closed:
+            return False
+        if self._thread is None:
+            self.start()
+        record = {'ts': time.time(), 'event': event}
+        record.update(fields)
+        try:
+            self._queue.put_nowait(record)
+            if self._queue.qsize() >= self._flush_at:
+                self._wake.set()
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+    
+    def metrics(self):
+        """Return written/dropped counters and the number of events waiting."""
+        return {'written': self.written, 'dropped': self.dropped, 'pending': self._queue.qsize()}
+    
+    def _open(self):
+        """Set up the rotating log file. Returns None if there is no file to write."""
+        if not self.path:
+            return None
+        try:
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=EVENT_LOG_MAX_BYTES, backupCount=EVENT_LOG_BACKUPS,
+                encoding='utf-8')
+        except OSError as e:
+            print(f"⚠ Could not open event log {self.path}: {str(e)}")
+            return None
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger = logging.getLogger('autocar.events')
+        logger.propagate = False  # Keep events off the console
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        return logger
+    
+    def _close(self):
+        if self._logger is not None:
+            for handler in list(self._logger.handlers):
+                self._logger.removeHandler(handler)
+                handler.close()
+            self._logger = None
+    
+    def _worker(self):
+        """Write all queued events in one batch every flush interval, or sooner when half full."""
+        self._logger = self._open()
+        try:
+            while True:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                stopping = self._stopped.is_set()
+                self._write(self._drain())
+                if stopping:
+                    break
+                if self.summary_interval and time.time() - self._summary_since >= self.summary_interval:
+                    self._print_summary()
+        finally:
+            self._close()
+            self._print_summary()
+    
+    def _drain(self):
+        """Take every event currently queued."""
+        events = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                return events
+    
+    def _write(self, events):
+        """Count the events and append them to the log file as NDJSON."""
+        if not events:
+            return
+        lines = []
+        for fields in events:
+            event = fields['event']
+            self._counts[event] = self._counts.get(event, 0) + 1
+            if 'error' in fields:
+                self._last_error = fields
+            if self._logger is not None:
+                lines.append(json.dumps(fields, default=str))
+        if lines:
+            # One record per batch: the handler writes and flushes once
+            self._logger.info('\n'.join(lines))
+        self.written += len(events)
+    
+    def _print_summary(self):
+        """Print event counts since the previous summary, if there were any."""
+        dropped = self.dropped - self._summary_dropped
+        if not self._counts and not dropped:
+            return
+        elapsed = time.time() - self._summary_since
+        counts = ', '.join(f"{event}: {count}" for event, count in sorted(self._counts.items()))
+        print(f"Events in last {elapsed:.0f}s: {counts or 'none'}"
+              + (f" ({dropped} dropped, log queue full)" if dropped else ""))
+        if self._last_error is not None:
+            print(f"  Last error ({self._last_error['event']}): {self._last_error['error']}")
+        self._counts = {}
+        self._last_error = None
+        self._summary_dropped += dropped
+        self._summary_since = time.time()
+
+
+EVENT_LOG = EventLog()
+
+# ==================== LATENCY TRACKING ====================
+# Hops of the round trip, in order. 'select' is the best-frame window and
+# 'total' runs from the first detection to speech start.
+LATENCY_HOPS = ('detect', 'select', 'encode', 'upload', 'recognition', 'message', 'speech', 'total')
+
+
+def new_capture_id():
+    """Create a short unique ID that follows a capture through the round trip."""
+    return uuid.uuid4().hex[:12]
+
+
+def percentile(sorted_values, pct):
+    """Return the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = int(round(pct / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[rank]
+
+
+class LatencyTracker:
+    """Record per-hop latency for each capture, keyed by capture ID."""
+    
+    def __init__(self, history=LATENCY_HISTORY, max_pending=LATENCY_MAX_PENDING):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()  # capture_id -> timestamps of the capture
+        self._samples = {hop: deque(maxlen=history) for hop in LATENCY_HOPS}
+    
+    def start(self, capture_id, start_time):
+        """Begin tracking a capture whose detection started at start_time."""
+        with self._lock:
+            self._pending[capture_id] = {'start': start_time}
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)  # Reply never came back
+    
+    def record(self, capture_id, hop, seconds):
+        """Record the duration of one hop for a tracked capture."""
+        with self._lock:
+            entry = self._pending.get(capture_id)
+            if entry is None:
+                return
+            entry[hop] = seconds
+            self._samples[hop].append(seconds * 1000.0)
+    
+    def upload_started(self, capture_id, started_at):
+        """Remember when the upload to the PC began."""
+        with self._lock:
+            entry = self._pending.get(capture_id)
+            if entry is not None:
+                entry['upload_start'] = started_at
+    
+    def upload_finished(self, capture_id, finished_at):
+        """Record the upload hop, unless the reply already came in during the upload."""
+        with self._lock:
+            entry = self._pending.get(capture_id)
+            if entry is None:
+                return
+            entry['uploaded_at'] = finished_at
+            upload_start = entry.get('upload_start')
+            replied = 'message_at' in entry
+        if upload_start is not None and not replied:
+            self.record(capture_id, 'upload', max(0.0, finished_at - upload_start))
+    
+    def message_received(self, capture_id, received_at, recognition_ms=None):
+        """
+        Split the time between upload and reply into recognition and message hops.
+        
+        A PC that runs recognition before answering the webhook replies while
+        the upload is still open. The wait then starts at the upload start, and
+        whatever recognition does not account for becomes the upload hop.
+        """
+        with self._lock:
+            entry = self._pending.get(capture_id)
+            if entry is None:
+                return
+            entry['message_at'] = received_at
+            uploaded_at = entry.get('uploaded_at')
+            upload_start = entry.get('upload_start')
+        if uploaded_at is not None:
+            since, remaining_hop = uploaded_at, 'message'
+        elif upload_start is not None:
+            since, remaining_hop = upload_start, 'upload'
+        else:
+            return
+        waited = max(0.0, received_at - since)
+        if recognition_ms is not None:
+            recognition = min(waited, max(0.0, recognition_ms / 1000.0))
+            self.record(capture_id, 'recognition', recognition)
+            waited -= recognition
+        self.record(capture_id, remaining_hop, waited)
+    
+    def speech_started(self, capture_id, started_at):
+        """Close the round trip for a capture once its announcement starts."""
+        with self._lock:
+            entry = self._pending.get(capture_id)
+            message_at = entry.get('message_at') if entry else None
+        if message_at is None:
+            return
+        self.record(capture_id, 'speech', max(0.0, started_at - message_at))
+        self.record(capture_id, 'total', max(0.0, started_at - entry['start']))
+        with self._lock:
+            self._pending.pop(capture_id, None)
+        EVENT_LOG.log('latency', capture_id=capture_id,
+                      **{f"{hop}_ms": round(entry[hop] * 1000.0, 1)
+                         for hop in LATENCY_HOPS if hop in entry})
+    
+    def summary(self):
+        """Return count and p50/p90/p99/max in milliseconds for every hop."""
+        with self._lock:
+            samples = {hop: sorted(values) for hop, values in self._samples.items()}
+        report = {}
+        for hop in LATENCY_HOPS:
+            values = samples[hop]
+            if not values:
+                report[hop] = {'count': 0}
+                continue
+            report[hop] = {
+                'count': len(values),
+                'p50': round(percentile(values, 50), 1),
+                'p90': round(percentile(values, 90), 1),
+                'p99': round(percentile(values, 99), 1),
+                'max': round(values[-1], 1),
+            }
+        return report
+    
+    def print_report(self):
+        """Print the latency percentiles of every hop."""
+        print("Latency per hop (ms):")
+        for hop, stats in self.summary().items():
+            if stats['count'] == 0:
+                print(f"  {hop:<12} no samples")
+            else:
+                print(f"  {hop:<12} p50={stats['p50']:>8} p90={stats['p90']:>8} "
+                      f"p99={stats['p99']:>8} max={stats['max']:>8} (n={stats['count']})")
+
+
+LATENCY_TRACKER = LatencyTracker()
+
 # ==================== TEXT TO SPEECH ====================
 def init_tts_engine():
     """Initialize text-to-speech engine."""
@@ -89,17 +489,35 @@ def init_tts_engine():
         print(f"  TTS will be disabled. Install pyttsx3: pip3 install pyttsx3")
         return None
 
-# TTS availability flag (we'll create engine instances as needed)
-TTS_AVAILABLE = PYTTSX3_AVAILABLE
-if PYTTSX3_AVAILABLE:
+# TTS availability flag, set by warm_up_tts() during startup
+TTS_AVAILABLE = False
+
+
+def warm_up_tts():
+    """Import pyttsx3 and build one engine so the first announcement starts fast."""
+    global pyttsx3, PYTTSX3_AVAILABLE, TTS_AVAILABLE
+    # Try to import pyttsx3 - handle Python version incompatibility gracefully
+    try:
+        import pyttsx3 as pyttsx3_module
+    except (ImportError, SyntaxError) as e:
+        # pyttsx3 requires Python 3.7+ (uses 'from __future__ import annotations')
+        # If running on Python 3.6 or earlier, TTS will be disabled
+        print(f"⚠ Warning: pyttsx3 not available (requires Python 3.7+): {str(e)}")
+        print(f"  TTS functionality will be disabled. Upgrade to Python 3.7+ to enable TTS.")
+        return False
+    pyttsx3 = pyttsx3_module
+    PYTTSX3_AVAILABLE = True
     try:
-        # Test if TTS is available
-        test_engine = pyttsx3.init()
-        test_engine = None  # Clean up test
-    except:
+        # Loads the speech driver; the engine itself is dropped so that
+        # speak_message() still gets a fresh instance every time
+        warm_engine = pyttsx3.init()
+        warm_engine = None
+        TTS_AVAILABLE = True
+    except Exception:
         TTS_AVAILABLE = False
+    return TTS_AVAILABLE
 
-def speak_message(message):
+def speak_message(message, capture_id=None):
     """Convert message to speech if it contains person information."""
     if not TTS_AVAILABLE or not PYTTSX3_AVAILABLE:
         return
@@ -132,6 +550,8 @@ def speak_message(message):
                     engine = pyttsx3.init()
                     engine.setProperty('rate', 150)  # Speed of speech
                     engine.say(speech_text)
+                    if capture_id:
+                        LATENCY_TRACKER.speech_started(capture_id, time.time())
                     engine.runAndWait()
                     # Engine will be cleaned up automatically after use
                 except Exception as e:
@@ -144,141 +564,933 @@ def speak_message(message):
         print(f"⚠ Error processing TTS: {str(e)}")
 
 
+# ==================== MESSAGE QUEUE ====================
+def validate_message(data):
+    """Return an error string if a /message payload is malformed, else None."""
+    if not isinstance(data, dict):
+        return "payload must be a JSON object"
+    if not isinstance(data.get('message', ''), str):
+        return "'message' must be a string"
+    timestamp = data.get('timestamp')
+    if timestamp not in (None, '') and not isinstance(timestamp, (int, float)):
+        return "'timestamp' must be a number"
+    if not isinstance(data.get('capture_id') or '', str):
+        return "'capture_id' must be a string"
+    recognition_ms = data.get('recognition_ms')
+    if recognition_ms is not None and (isinstance(recognition_ms, bool)
+                                       or not isinstance(recognition_ms, (int, float))):
+        return "'recognition_ms' must be a number"
+    if not isinstance(data.get('priority', 0), int):
+        return "'priority' must be an integer"
+    return None
+
+
+def process_message(data, received_at):
+    """Display a message from the PC and announce it if it names a person."""
+    message = data.get('message', '')
+    timestamp = data.get('timestamp', '')
+    source = data.get('source', 'PC')
+    capture_id = data.get('capture_id')
+    
+    # Match the reply to the capture that produced it
+    if capture_id:
+        LATENCY_TRACKER.message_received(
+            capture_id, received_at, data.get('recognition_ms'))
+    EVENT_LOG.log('message', source=source, capture_id=capture_id,
+                  person="Person:" in message,
+                  wait_ms=round((time.time() - received_at) * 1000.0, 1))
+    
+    # Display message in terminal
+    if timestamp:
+        try:
+            dt = datetime.fromtimestamp(timestamp)
+            time_str = dt.strftime('%Y-%m-%d %H:%M:%S')
+        except:
+            time_str = str(timestamp)
+    else:
+        time_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    print(f"\n[{time_str}] Message from {source}:")
+    print(f"  {message}\n")
+    
+    # Convert to speech if it's a person detection message
+    if "Person:" in message:
+        speak_message(message, capture_id)
+
+
+class MessageQueue:
+    """Bounded priority queue between the /message handler and display/speech."""
+    
+    def __init__(self, max_size=MESSAGE_QUEUE_SIZE, handler=process_message):
+        self.max_size = max_size
+        self.handler = handler
+        self._queue = queue.PriorityQueue(maxsize=max_size)
+        self._sequence = itertools.count()  # Keeps FIFO order within a priority
+        self._lock = threading.Lock()
+        self._thread = None
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self._waits = deque(maxlen=LATENCY_HISTORY)
+    
+    def start(self):
+        """Start the consumer thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, daemon=True)
+            self._thread.start()
+    
+    def submit(self, data, received_at):
+        """
+        Queue a validated message.
+        
+        Person results go ahead of other messages unless the payload sets its
+        own 'priority' (lower runs first).
+        
+        Returns:
+            bool: False if the queue is full
+        """
+        default_priority = 0 if "Person:" in data.get('message', '') else 1
+        item = (data.get('priority', default_priority), next(self._sequence), received_at, data)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.accepted += 1
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+    
+    def _worker(self):
+        """Handle queued messages one at a time."""
+        while True:
+            _, _, received_at, data = self._queue.get()
+            with self._lock:
+                self._waits.append((time.time() - received_at) * 1000.0)
+            try:
+                self.handler(data, received_at)
+                with self._lock:
+                    self.processed += 1
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                EVENT_LOG.log('message_error', error=str(e))
+    
+    def metrics(self):
+        """Return queue depth, counters and queue wait percentiles in milliseconds."""
+        with self._lock:
+            waits = sorted(self._waits)
+            metrics = {
+                'depth': self._queue.qsize(),
+                'capacity': self.max_size,
+                'max_depth': self.max_depth,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'processed': self.processed,
+                'failed': self.failed,
+            }
+        if waits:
+            metrics['wait_p50'] = round(percentile(waits, 50), 1)
+            metrics['wait_p99'] = round(percentile(waits, 99), 1)
+        return metrics
+
+
+MESSAGE_QUEUE = MessageQueue()
+
+
+# ==================== RUNTIME CONFIGURATION ====================
+def _is_number(value):
+    # json.loads accepts Infinity and NaN, which json.dump would write back as invalid JSON
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_url(value):
+    return value is None or (isinstance(value, str) and
+                             (value == '' or value.startswith(('http://', 'https://'))))
+
+
+# Settings that can be changed while running: name -> (check, error message)
+CONFIG_FIELDS = {
+    'capture_interval': (lambda v: _is_number(v) and v >= 0, "must be a number >= 0"),
+    'scale_factor': (lambda v: _is_number(v) and v > 1.0, "must be a number > 1.0"),
+    'min_neighbors': (lambda v: _is_int(v) and v >= 0, "must be an integer >= 0"),
+    'min_face_size': (lambda v: _is_int(v) and v >= 1, "must be an integer >= 1"),
+    'detect_scale': (lambda v: _is_number(v) and 0 < v <= 1.0, "must be a number in (0, 1]"),
+    'selection_window': (lambda v: _is_number(v) and v >= 0, "must be a number >= 0"),
+    'jpeg_quality': (lambda v: _is_int(v) and 1 <= v <= 100, "must be an integer from 1 to 100"),
+    'target_fps': (lambda v: _is_number(v) and v >= 0, "must be a number >= 0"),
+    'cpu_budget': (lambda v: _is_number(v) and 0 <= v <= 1, "must be a number from 0 to 1"),
+    'webhook_url': (_is_url, "must be an http(s):// URL, or empty to disable"),
+}
+
+
+class RuntimeConfig:
+    """
+    Tunable settings, changed through /config.
+    
+    Only settings that differ from the values in this file are saved to
+    CONFIG_FILE, so editing a constant here still takes effect for every
+    setting that was never changed through /config.
+    """
+    
+    def __init__(self, path=CONFIG_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._overrides = {}  # Settings changed through /config: name -> value
+        self._defaults = {
+            'capture_interval': CAPTURE_INTERVAL,
+            'scale_factor': DETECT_SCALE_FACTOR,
+            'min_neighbors': DETECT_MIN_NEIGHBORS,
+            'min_face_size': DETECT_MIN_SIZE,
+            'detect_scale': DETECT_SCALE,
+            'selection_window': SELECTION_WINDOW,
+            'jpeg_quality': JPEG_QUALITY,
+            'target_fps': TARGET_FPS,
+            'cpu_budget': CPU_BUDGET,
+            'webhook_url': PC_WEBHOOK_URL,
+        }
+        self._values = dict(self._defaults)
+    
+    def get(self):
+        """Return a copy of the current settings."""
+        return dict(self._values)
+    
+    def overrides(self):
+        """Return a copy of the settings that differ from the code defaults."""
+        return dict(self._overrides)
+    
+    def validate(self, changes):
+        """Return a dict of field -> error for every invalid or unknown field."""
+        if not isinstance(changes, dict):
+            return {'': "payload must be a JSON object"}
+        errors = {}
+        for name, value in changes.items():
+            if name not in CONFIG_FIELDS:
+                errors[name] = "unknown setting"
+                continue
+            check, message = CONFIG_FIELDS[name]
+            if not check(value):
+                errors[name] = message
+        return errors
+    
+    def update(self, changes, save=True):
+        """
+        Validate and apply changes all at once.
+        
+        Args:
+            changes: Dict with some of the CONFIG_FIELDS
+            save: Write the result to the config file
+            
+        Returns:
+            tuple: (settings, errors). Nothing is applied if errors is not empty.
+        """
+        errors = self.validate(changes)
+        if errors:
+            return self.get(), errors
+        
+        # Listeners run under the lock so concurrent updates apply in order
+        with self._lock:
+            overrides = dict(self._overrides)
+            overrides.update(changes)
+            # Setting a value back to its default drops the override
+            self._overrides = {name: value for name, value in overrides.items()
+                               if value != self._defaults[name]}
+            values = dict(self._defaults)
+            values.update(self._overrides)
+            self._values = values
+            for listener in self._listeners:
+                listener(values)
+            if save:
+                self.save()
+        return dict(values), {}
+    
+    def subscribe(self, listener):
+        """Call listener(settings) now and after every update."""
+        with self._lock:
+            self._listeners.append(listener)
+            listener(dict(self._values))
+    
+    def load(self):
+        """Apply overrides saved by an earlier run, if any, on top of the code defaults."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Could not read {self.path}: {str(e)}")
+            return
+        _, errors = self.update(saved, save=False)
+        if errors:
+            print(f"⚠ Ignoring {self.path}: {errors}")
+        elif self._overrides:
+            print(f"Settings from {self.path} override the code: {self._overrides}")
+            print(f"  Set them back through /config or delete the file to use the code values")
+    
+    def save(self):
+        """Write the overrides to the config file, replacing it atomically."""
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self._overrides, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠ Could not save {self.path}: {str(e)}")
+
+
+RUNTIME_CONFIG = RuntimeConfig()
+
+
 # ==================== MESSAGE RECEIVER ====================
 class MessageHandler(http.server.SimpleHTTPRequestHandler):
     """HTTP request handler for receiving messages from PC."""
     
+    # Headers and body go out as separate writes; don't let Nagle hold the body
+    disable_nagle_algorithm = True
+    
+    def _send_json(self, status, response, headers=None):
+        """Send a JSON response with the given status code."""
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
     def do_POST(self):
-        """Handle POST requests with messages."""
+        """Validate a message, queue it for display/speech and reply right away."""
         if self.path == '/message':
+            received_at = time.time()
             try:
                 content_length = int(self.headers['Content-Length'])
                 post_data = self.rfile.read(content_length)
                 data = json.loads(post_data.decode('utf-8'))
-                message = data.get('message', '')
-                timestamp = data.get('timestamp', '')
-                source = data.get('source', 'PC')
-                
-                # Display message in terminal
-                if timestamp:
-                    try:
-                        dt = datetime.fromtimestamp(timestamp)
-                        time_str = dt.strftime('%Y-%m-%d %H:%M:%S')
-                    except:
-                        time_str = str(timestamp)
-                else:
-                    time_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                
-                print(f"\n[{time_str}] Message from {source}:")
-                print(f"  {message}\n")
-                
-                # Convert to speech if it's a person detection message
-                if "Person:" in message:
-                    speak_message(message)
-                
-                # Send success response
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                response = {'status': 'success', 'message': 'Message received'}
-                self.wfile.write(json.dumps(response).encode('utf-8'))
-                
-            except Exception as e:
-                print(f"✗ Error processing message: {str(e)}")
-                self.send_response(500)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                response = {'status': 'error', 'message': str(e)}
-                self.wfile.write(json.dumps(response).encode('utf-8'))
+            except (TypeError, ValueError) as e:
+                EVENT_LOG.log('message_rejected', status=400, error=f"Invalid request: {str(e)}")
+                self._send_json(400, {'status': 'error', 'message': f"Invalid request: {str(e)}"})
+                return
+            
+            error = validate_message(data)
+            if error:
+                EVENT_LOG.log('message_rejected', status=400, error=error)
+                self._send_json(400, {'status': 'error', 'message': error})
+                return
+            
+            # Display and speech happen on the queue's consumer thread
+            if not MESSAGE_QUEUE.submit(data, received_at):
+                EVENT_LOG.log('message_rejected', status=429, error="Message queue full",
+                              capture_id=data.get('capture_id'))
+                self._send_json(429, {'status': 'error', 'message': 'Message queue full'},
+                                headers={'Retry-After': '1'})
+                return
+            
+            self._send_json(200, {'status': 'success', 'message': 'Message received'})
         else:
             self.send_response(404)
             self.end_headers()
     
+    def do_PUT(self):
+        """Change runtime settings; all fields are checked before any is applied."""
+        if self.path == '/config':
+            try:
+                content_length = int(self.headers['Content-Length'])
+                changes = json.loads(self.rfile.read(content_length).decode('utf-8'))
+            except (TypeError, ValueError) as e:
+                self._send_json(400, {'status': 'error', 'message': f"Invalid request: {str(e)}"})
+                return
+            
+            if isinstance(changes, dict) and 'webhook_url' in changes and not self._trusted():
+                EVENT_LOG.log('config_rejected', client=self.client_address[0],
+                              error="webhook_url change without a valid token")
+                self._send_json(403, {'status': 'error',
+                                      'errors': {'webhook_url': "can only be changed from the autocar "
+                                                                "itself or with X-Config-Token"}})
+                return
+            
+            settings, errors = RUNTIME_CONFIG.update(changes)
+            if errors:
+                self._send_json(400, {'status': 'error', 'errors': errors})
+            else:
+                print(f"Settings updated: {changes}")
+                EVENT_LOG.log('config', changes=changes)
+                self._send_json(200, settings)
+        else:
+            self.send_response(404)
+            self.end_headers()
+    
+    def _trusted(self):
+        """True for requests from this machine or carrying the configured CONFIG_TOKEN."""
+        try:
+            if ipaddress.ip_address(self.client_address[0]).is_loopback:
+                return True
+        except ValueError:
+            pass
+        token = self.headers.get('X-Config-Token', '')
+        return bool(CONFIG_TOKEN) and hmac.compare_digest(token.encode('utf-8'),
+                                                          CONFIG_TOKEN.encode('utf-8'))
+    
     def do_GET(self):
         """Handle GET requests (health check)."""
         if self.path == '/health':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            response = {'status': 'healthy', 'service': 'Message Receiver'}
-            self.wfile.write(json.dumps(response).encode('utf-8'))
+            response = {'status': 'healthy', 'service': 'Message Receiver',
+                        'queue': MESSAGE_QUEUE.metrics(), 'events': EVENT_LOG.metrics()}
+            self._send_json(200, response)
+        elif self.path == '/latency':
+            self._send_json(200, LATENCY_TRACKER.summary())
+        elif self.path == '/config':
+            self._send_json(200, RUNTIME_CONFIG.get())
         else:
             self.send_response(404)
             self.end_headers()
     
     def log_message(self, format, *args):
-        """Override to reduce log noise."""
-        if args[0].startswith('"GET') or args[0].startswith('"POST'):
+        """Send server errors to the event log instead of stderr."""
+        # args[0] is the bare request line for request logs ('POST /message ...')
+        if args and isinstance(args[0], str) and args[0].startswith(('GET', 'POST', 'PUT')):
             return
-        super().log_message(format, *args)
+        EVENT_LOG.log('http_error', client=self.address_string(), error=format % args)
 
 
-def start_message_receiver():
-    """Start the message receiver server in a separate thread."""
+class MessageServer(socketserver.TCPServer):
+    """TCP server for the message receiver."""
+    
+    # The default backlog of 5 drops connections when the PC sends bursts,
+    # and each dropped SYN costs the sender a 1 s retransmit
+    request_queue_size = 64
+
+
+def bind_message_receiver(host=None, port=None):
+    """Bind the message receiver socket. Returns the server or None on failure."""
+    host = MESSAGE_HOST if host is None else host
+    port = MESSAGE_PORT if port is None else port
     try:
-        with socketserver.TCPServer((MESSAGE_HOST, MESSAGE_PORT), MessageHandler) as httpd:
-            print(f"Message receiver started on port {MESSAGE_PORT}")
-            print(f"Waiting for messages from PC...")
-            httpd.serve_forever()
+        return MessageServer((host, port), MessageHandler)
     except OSError as e:
         if "Address already in use" in str(e):
-            print(f"✗ Port {MESSAGE_PORT} is already in use")
+            print(f"✗ Port {port} is already in use")
             print(f"  Another instance might be running, or port is occupied")
         else:
             print(f"✗ Error starting message receiver: {str(e)}")
+        return None
+
+
+def start_message_receiver(httpd=None):
+    """Start the message receiver server in a separate thread."""
+    if httpd is None:
+        httpd = bind_message_receiver()
+        if httpd is None:
+            return
+    MESSAGE_QUEUE.start()
+    try:
+        with httpd:
+            print(f"Message receiver started on port {httpd.server_address[1]}")
+            print(f"Waiting for messages from PC...")
+            httpd.serve_forever()
     except KeyboardInterrupt:
         print("\nMessage receiver stopped")
 
 
-# ==================== FACE DETECTION ====================
-class FaceCapture:
-    def __init__(self):
-        """Initialize the face capture system."""
-        self.save_folder = SAVE_FOLDER
-        self.width = CAMERA_WIDTH
-        self.height = CAMERA_HEIGHT
-        self.image_counter = 1
-        self.last_capture_time = 0
-        self.capture_interval = CAPTURE_INTERVAL
-        self.webhook_url = PC_WEBHOOK_URL
+# ==================== PERSISTENT CHANNEL ====================
+# Frame layout: 1-byte type, 4-byte meta length, 4-byte data length (network
+# byte order), then the meta JSON (UTF-8) and the raw data bytes.
+FRAME_HEADER = struct.Struct('!BII')
+FRAME_HELLO = 1    # autocar -> PC, meta: {'client': 'autocar', 'protocol': 1}
+FRAME_IMAGE = 2    # autocar -> PC, meta: filename/timestamp/capture_id, data: JPEG bytes
+FRAME_MESSAGE = 3  # PC -> autocar, meta: same JSON as a POST to /message
+FRAME_PING = 4     # either way, answered with FRAME_PONG
+FRAME_PONG = 5
+CHANNEL_MAX_FRAME = 16 * 1024 * 1024  # Larger frames mean a broken stream
+
+
+def recv_exact(sock, size):
+    """
+    Read exactly size bytes from a socket, or raise ConnectionError.
+    
+    socket.timeout is only raised if nothing was read yet. A timeout after
+    part of the data arrived raises ConnectionError instead, because the
+    stream can no longer be read from a frame boundary.
+    """
+    chunks = []
+    while size > 0:
+        try:
+            chunk = sock.recv(size)
+        except socket.timeout:
+            if chunks:
+                raise ConnectionError(f"Timed out with {size} bytes of a frame still to come")
+            raise
+        if not chunk:
+            raise ConnectionError("Connection closed by peer")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+class PersistentChannel:
+    """One TCP connection, opened by the autocar, carrying images up and results down."""
+    
+    def __init__(self, host=PC_IP, port=PC_CHANNEL_PORT, on_message=None):
+        self.host = host
+        self.port = port
+        self.on_message = on_message
+        self.connects = 0
+        self.images_sent = 0
+        self.messages_received = 0
+        self._sock = None
+        self._send_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+    
+    @property
+    def connected(self):
+        return self._sock is not None
+    
+    def start(self):
+        """Connect in the background and keep reconnecting until stop()."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """Close the connection and stop reconnecting."""
+        self._stopped.set()
+        self._close()
+    
+    def send_image(self, img_data, filename, capture_id=None):
+        """Send a JPEG up the channel. Returns False if it is not connected."""
+        meta = {'filename': filename, 'timestamp': time.time(), 'capture_id': capture_id}
+        if self._send(FRAME_IMAGE, meta, img_data):
+            self.images_sent += 1
+            return True
+        return False
+    
+    def stats(self):
+        """Return connection state and counters."""
+        return {
+            'connected': self.connected,
+            'connects': self.connects,
+            'images_sent': self.images_sent,
+            'messages_received': self.messages_received,
+        }
+    
+    def _send(self, frame_type, meta=None, data=b''):
+        """Send one frame. Returns False (and drops the connection) on failure."""
+        sock = self._sock
+        if sock is None:
+            return False
+        meta_bytes = json.dumps(meta).encode('utf-8') if meta is not None else b''
+        header = FRAME_HEADER.pack(frame_type, len(meta_bytes), len(data))
+        try:
+            with self._send_lock:
+                sock.sendall(header + meta_bytes)
+                if data:
+                    sock.sendall(data)
+            return True
+        except OSError as e:
+            print(f"✗ Channel send failed: {str(e)}")
+            self._close()
+            return False
+    
+    def _close(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+    
+    def _run(self):
+        """Connect, read frames and reconnect with backoff until stopped."""
+        retry_delay = CAMERA_RECONNECT_MIN_DELAY
+        while not self._stopped.is_set():
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=5)
+            except OSError as e:
+                if self.connects == 0 and retry_delay == CAMERA_RECONNECT_MIN_DELAY:
+                    print(f"⚠ Channel to {self.host}:{self.port} not available ({str(e)}), "
+                          f"using HTTP until it is")
+                self._stopped.wait(retry_delay)
+                retry_delay = min(retry_delay * 2, CAMERA_RECONNECT_MAX_DELAY)
+                continue
+            
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.settimeout(CHANNEL_HEARTBEAT_INTERVAL)
+            self._sock = sock
+            self.connects += 1
+            retry_delay = CAMERA_RECONNECT_MIN_DELAY
+            print(f"✓ Channel connected to {self.host}:{self.port}")
+            self._send(FRAME_HELLO, {'client': 'autocar', 'protocol': 1})
+            
+            try:
+                self._read_frames(sock)
+            except (OSError, ValueError) as e:
+                if not self._stopped.is_set():
+                    print(f"⚠ Channel lost: {str(e)}, reconnecting")
+            finally:
+                if self._sock is sock:
+                    self._close()
+    
+    def _read_frames(self, sock):
+        """Dispatch incoming frames; ping when idle and give up when the PC goes quiet."""
+        last_heard = time.time()
+        while not self._stopped.is_set():
+            try:
+                header = recv_exact(sock, FRAME_HEADER.size)
+            except socket.timeout:
+                if time.time() - last_heard > CHANNEL_TIMEOUT:
+                    raise ConnectionError(f"no data for {CHANNEL_TIMEOUT}s")
+                self._send(FRAME_PING)
+                continue
+            
+            # Once a header has arrived the rest of the frame follows right away
+            frame_type, meta_len, data_len = FRAME_HEADER.unpack(header)
+            if meta_len + data_len > CHANNEL_MAX_FRAME:
+                raise ValueError(f"frame of {meta_len + data_len} bytes")
+            meta = json.loads(recv_exact(sock, meta_len).decode('utf-8')) if meta_len else None
+            if data_len:
+                recv_exact(sock, data_len)  # No frame from the PC carries data yet
+            last_heard = time.time()
+            
+            if frame_type == FRAME_PING:
+                self._send(FRAME_PONG)
+            elif frame_type == FRAME_MESSAGE:
+                self.messages_received += 1
+                if self.on_message is not None:
+                    self.on_message(meta, last_heard)
+
+
+def submit_channel_message(data, received_at):
+    """Queue a message that came down the channel, same as a POST to /message."""
+    error = validate_message(data)
+    if error:
+        EVENT_LOG.log('message_rejected', transport='tcp', error=error)
+    elif not MESSAGE_QUEUE.submit(data, received_at):
+        EVENT_LOG.log('message_rejected', transport='tcp', error="Message queue full",
+                      capture_id=data.get('capture_id'))
+
+
+# ==================== STARTUP ====================
+def run_startup_phases(phases):
+    """
+    Run independent startup phases in parallel and print how long each took.
+    
+    Args:
+        phases: List of (name, callable) pairs
         
-        # Create save folder if it doesn't exist
-        if not os.path.exists(self.save_folder):
-            os.makedirs(self.save_folder)
-            print(f"Created folder: {self.save_folder}")
+    Returns:
+        dict: Result of each phase by name. The first failure is re-raised
+        once every phase has finished.
+    """
+    timings = {}
+    
+    def timed(name, func):
+        start = time.time()
+        try:
+            return func()
+        finally:
+            timings[name] = time.time() - start
+    
+    wall_start = time.time()
+    with ThreadPoolExecutor(max_workers=len(phases)) as pool:
+        futures = [(name, pool.submit(timed, name, func)) for name, func in phases]
+    wall_time = time.time() - wall_start
+    
+    results = {}
+    errors = []
+    for name, future in futures:
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            errors.append(e)
+    
+    print("Startup phases (parallel):")
+    for name, _ in phases:
+        print(f"  {name:<10} {timings.get(name, 0):.2f}s")
+    print(f"  {'total':<10} {wall_time:.2f}s (serial would be {sum(timings.values()):.2f}s, "
+          f"{time.time() - PROCESS_START:.2f}s since launch)")
+    
+    if errors:
+        raise errors[0]
+    return results
+
+
+# ==================== CAMERA PIPELINE ====================
+PIXEL_FORMATS = ('BGR', 'GRAY8', 'I420')
+
+
+def build_camera_pipeline(width, height, fps=CAMERA_FPS, pixel_format=CAMERA_PIXEL_FORMAT):
+    """
+    Build a GStreamer pipeline on top of Util.gstrmer().
+    
+    The source chain from Util.gstrmer() is kept; the output format and frame
+    rate are swapped in, and the appsink only holds the newest frame so reads
+    never return stale buffered frames. On the stock Jetson chain
+    (nvvidconv -> BGRx -> videoconvert -> BGR) gray and I420 frames come
+    straight from nvvidconv, so no CPU conversion runs per frame.
+    
+    Args:
+        width: Camera frame width
+        height: Camera frame height
+        fps: Capture frame rate, or None to keep the Util.gstrmer() default
+        pixel_format: One of PIXEL_FORMATS
+        
+    Returns:
+        str: Pipeline for cv2.VideoCapture(..., cv2.CAP_GSTREAMER)
+    """
+    if pixel_format not in PIXEL_FORMATS:
+        raise ValueError(f"Unsupported pixel format {pixel_format!r}, use one of {PIXEL_FORMATS}")
+    
+    load_cv2()
+    source = re.split(r'!\s*appsink\b', Util.gstrmer(width=width, height=height))[0].strip()
+    
+    if fps:
+        source, count = re.subn(r'framerate=(\(fraction\))?\d+/\d+', f'framerate={fps}/1', source)
+        if count == 0:
+            source += f' ! videorate ! video/x-raw, framerate={fps}/1'
+    
+    # nvvidconv converts in hardware; asking it for the target format replaces
+    # both its BGRx output and the CPU videoconvert that repacked BGRx as BGR
+    nvvidconv = re.search(r'(nvvidconv\b[^!]*!\s*video/x-raw[^!]*?)format=(\(string\))?BGRx\b([^!]*)'
+                          r'!\s*videoconvert\s*!\s*video/x-raw[^!]*', source)
+    if pixel_format != 'BGR' and nvvidconv:
+        rest = source[nvvidconv.end():].strip()
+        source = (source[:nvvidconv.start()] + nvvidconv.group(1) + f'format={pixel_format}'
+                  + nvvidconv.group(3).rstrip() + (f' {rest}' if rest else ''))
+    elif pixel_format != 'BGR':
+        # Other sources: swap the last BGR caps, letting videoconvert produce the format
+        bgr_caps = list(re.finditer(r'format=(\(string\))?BGR\b', source))
+        if bgr_caps:
+            last = bgr_caps[-1]
+            source = source[:last.start()] + f'format={pixel_format}' + source[last.end():]
         else:
-            self._update_image_counter()
+            source += f' ! videoconvert ! video/x-raw, format={pixel_format}'
+    
+    return f'{source} ! appsink drop=true max-buffers=1 sync=false'
+
+
+class FrameFormat:
+    """Turn raw pipeline frames into detection (gray) and capture (color) images."""
+    
+    def __init__(self, pixel_format=CAMERA_PIXEL_FORMAT, detect_scale=DETECT_SCALE):
+        if pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f"Unsupported pixel format {pixel_format!r}, use one of {PIXEL_FORMATS}")
+        self.pixel_format = pixel_format
+        self.detect_scale = detect_scale
+        # Output buffers reused from frame to frame
+        self._gray = None
+        self._small = None
+    
+    def gray(self, frame, detect_scale=None):
+        """Return the grayscale image used for detection, downscaled if configured."""
+        if detect_scale is None:
+            detect_scale = self.detect_scale
+        if self.pixel_format == 'BGR':
+            self._gray = gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        elif self.pixel_format == 'I420':
+            # The first two thirds of an I420 frame are the luma plane
+            gray = frame[:frame.shape[0] * 2 // 3]
+        else:
+            gray = frame
         
-        # Initialize camera
+        if detect_scale != 1.0:
+            size = (max(1, int(gray.shape[1] * detect_scale)), max(1, int(gray.shape[0] * detect_scale)))
+            if self._small is None or self._small.shape[:2] != (size[1], size[0]):
+                self._small = None  # Scale changed; let OpenCV allocate a new buffer
+            self._small = gray = cv2.resize(gray, size, dst=self._small,
+                                            interpolation=cv2.INTER_AREA)
+        return gray
+    
+    def color(self, frame, dst=None):
+        """Return the image to save. Only I420 frames need a conversion (into dst if given)."""
+        if self.pixel_format == 'I420':
+            return cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420, dst=dst)
+        return frame
+    
+    def preview(self, frame, dst=None):
+        """Return a color copy of frame to draw on, reusing dst when it fits."""
+        if self.pixel_format == 'I420':
+            return cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420, dst=dst)
+        if dst is None or dst.shape != frame.shape:
+            return frame.copy()
+        np.copyto(dst, frame)
+        return dst
+
+
+# ==================== CAMERA SUPERVISOR ====================
+class CameraSupervisor:
+    """Own the camera pipeline and rebuild it when reads fail or stall."""
+    
+    def __init__(self, width, height, name="camera", fps=CAMERA_FPS,
+                 pixel_format=CAMERA_PIXEL_FORMAT, source=None):
+        self.width = width
+        self.height = height
+        self.name = name
+        self.fps = fps
+        self.pixel_format = pixel_format
+        self.source = source
         self.camera = None
-        self._init_camera()
-        
-        # Initialize face detection
-        self.face_cascade = None
-        self._init_face_detector()
+        self.reconnects = 0
+        self.failed_reconnects = 0
+        self.total_downtime = 0.0
+        self.down_since = None
+        self.consecutive_failures = 0
+        self.frames_since_open = 0
+        self.retry_delay = CAMERA_RECONNECT_MIN_DELAY
+        self.next_attempt = 0
     
-    def _init_camera(self):
-        """Initialize camera using hardware-specific settings."""
+    def open(self):
+        """Build the GStreamer pipeline and open it. Raises if the camera is missing."""
+        load_cv2()
         Util.enable_imshow()
-        cam = Util.gstrmer(width=self.width, height=self.height)
-        self.camera = cv2.VideoCapture(cam, cv2.CAP_GSTREAMER)
+        if isinstance(self.source, int):
+            camera = cv2.VideoCapture(self.source)
+        else:
+            cam = self.source or build_camera_pipeline(self.width, self.height,
+                                                       self.fps, self.pixel_format)
+            camera = cv2.VideoCapture(cam, cv2.CAP_GSTREAMER)
         
-        if not self.camera.isOpened():
+        if not camera.isOpened():
+            camera.release()
             raise Exception("Camera not found or could not be opened")
         
-        actual_width = self.camera.get(cv2.CAP_PROP_FRAME_WIDTH)
-        actual_height = self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT)
-        print(f"Camera initialized: {actual_width}x{actual_height}")
+        self.camera = camera
+        self.consecutive_failures = 0
+        self.frames_since_open = 0
+        return camera
     
-    def _init_face_detector(self):
-        """Initialize Haar Cascade face detector."""
-        haar_face = '/usr/local/share/opencv4/haarcascades/haarcascade_frontalface_default.xml'
-        self.face_cascade = cv2.CascadeClassifier(haar_face)
+    def start(self):
+        """
+        Open the pipeline, or start in the down state if the camera is not ready.
+        
+        Returns:
+            The opened camera, or None if read() will keep retrying with backoff
+        """
+        try:
+            return self.open()
+        except Exception as e:
+            self._go_down(f"could not be opened ({str(e)})")
+            return None
+    
+    def release(self):
+        """Release the current pipeline, if any."""
+        if self.camera is not None:
+            self.camera.release()
+            self.camera = None
+    
+    def read(self, out=None):
+        """
+        Read a frame, rebuilding the pipeline if it has failed.
+        
+        Args:
+            out: Optional array to read into; reused when its size matches
         
-        if self.face_cascade.empty():
-            raise Exception("Failed to load face cascade classifier")
+        Returns:
+            tuple: (ret, frame) like cv2.VideoCapture.read(). While the camera
+            is down this waits for the next reconnect attempt and returns
+            (False, None) if it did not succeed.
+        """
+        if self.camera is None:
+            self._reconnect()
+            if self.camera is None:
+                return False, None
         
-        print("Face detector initialized")
+        read_start = time.time()
+        ret, frame = self.camera.read(out)
+        read_time = time.time() - read_start
+        
+        if not ret:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= CAMERA_MAX_READ_FAILURES:
+                self._go_down(f"{self.consecutive_failures} failed reads")
+            return False, None
+        
+        # The first read after opening includes sensor warm-up, so it is not a stall
+        if self.frames_since_open > 0 and read_time > CAMERA_STALL_TIMEOUT:
+            self._go_down(f"read stalled for {read_time:.1f}s")
+        elif self.down_since is not None:
+            # Only frames flowing again count as a reconnect and end the backoff
+            downtime = time.time() - self.down_since
+            self.total_downtime += downtime
+            self.down_since = None
+            self.reconnects += 1
+            self.retry_delay = CAMERA_RECONNECT_MIN_DELAY
+            print(f"✓ {self.name} recovered after {downtime:.1f}s "
+                  f"(reconnects: {self.reconnects})")
+            EVENT_LOG.log('camera_recovered', camera=self.name,
+                          downtime_ms=round(downtime * 1000.0, 1), reconnects=self.reconnects)
+        
+        self.consecutive_failures = 0
+        self.frames_since_open += 1
+        return True, frame
+    
+    def _go_down(self, reason):
+        """Drop the current pipeline and schedule a rebuild."""
+        print(f"⚠ {self.name} {reason}, rebuilding pipeline")
+        EVENT_LOG.log('camera_down', camera=self.name, error=reason)
+        self.release()
+        if self.down_since is None:
+            self.down_since = time.time()
+            self.retry_delay = CAMERA_RECONNECT_MIN_DELAY
+        else:
+            # Rebuilt but still no good frames: back off like a failed open
+            self.retry_delay = min(self.retry_delay * 2, CAMERA_RECONNECT_MAX_DELAY)
+        self.next_attempt = time.time() + self.retry_delay
+    
+    def _reconnect(self):
+        """Wait for the next attempt, then try to rebuild the pipeline with backoff."""
+        wait = self.next_attempt - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        
+        try:
+            self.open()
+            print(f"  {self.name} pipeline rebuilt")
+        except Exception as e:
+            self.failed_reconnects += 1
+            self.retry_delay = min(self.retry_delay * 2, CAMERA_RECONNECT_MAX_DELAY)
+            self.next_attempt = time.time() + self.retry_delay
+            print(f"✗ {self.name} reconnect failed: {str(e)} "
+                  f"(next try in {self.retry_delay:.1f}s)")
+            EVENT_LOG.log('camera_reconnect_failed', camera=self.name, error=str(e))
+    
+    def stats(self):
+        """Return reconnect count and downtime in seconds."""
+        downtime = self.total_downtime
+        if self.down_since is not None:
+            downtime += time.time() - self.down_since
+        return {
+            'reconnects': self.reconnects,
+            'failed_reconnects': self.failed_reconnects,
+            'downtime': round(downtime, 1),
+            'down': self.down_since is not None,
+        }
+
+
+# ==================== SHARED PIPELINE SERVICES ====================
+class CaptureStore:
+    """Numbered image files shared by every camera (1.jpg, 2.jpg, ...)."""
+    
+    def __init__(self, save_folder=SAVE_FOLDER):
+        self.save_folder = save_folder
+        self.image_counter = 1
+        self.saved = 0
+        self._lock = threading.Lock()
+        
+        # Create save folder if it doesn't exist
+        if not os.path.exists(self.save_folder):
+            os.makedirs(self.save_folder)
+            print(f"Created folder: {self.save_folder}")
+        else:
+            self._update_image_counter()
     
     def _update_image_counter(self):
         """Update image counter based on existing files."""
@@ -294,136 +1506,684 @@ class FaceCapture:
             if numbers:
                 self.image_counter = max(numbers) + 1
     
-    def detect_face(self, frame):
-        """Detect faces in the given frame."""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(
-            gray, 
-            scaleFactor=1.3,
-            minNeighbors=5,
-            minSize=(100, 100)
-        )
+    def next_path(self):
+        """Reserve the next free image number and return its path."""
+        with self._lock:
+            filename = f"{self.image_counter}.jpg"
+            self.image_counter += 1
+        return os.path.join(self.save_folder, filename)
+    
+    def write(self, filepath, img_data):
+        """Write encoded JPEG bytes to filepath. Raises OSError if the disk write fails."""
+        with open(filepath, 'wb') as img_file:
+            img_file.write(img_data)
+        with self._lock:
+            self.saved += 1
+
+
+
+class UploadQueue:
+    """Send captures to the PC webhook from one background thread."""
+    
+    def __init__(self, webhook_url=PC_WEBHOOK_URL, max_size=UPLOAD_QUEUE_SIZE, channel=None):
+        self.webhook_url = webhook_url
+        self.channel = channel  # PersistentChannel, preferred over HTTP while connected
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._help_shown = False
+    
+    def start(self):
+        """Start the upload thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, daemon=True)
+            self._thread.start()
+    
+    def stop(self, timeout=5.0):
+        """Let queued uploads finish (up to timeout seconds), then stop the thread."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+    
+    def apply_config(self, settings):
+        """Apply runtime settings from RuntimeConfig."""
+        self.webhook_url = settings['webhook_url'] or None
+    
+    @property
+    def enabled(self):
+        """True if there is anywhere to send images to."""
+        return bool(self.webhook_url or self.channel)
+    
+    def submit(self, image_path, capture_id=None, img_data=None):
+        """Queue an upload. Returns False (and counts a drop) if the queue is full."""
+        if not self.enabled:
+            return False
+        self.start()
+        try:
+            self._queue.put_nowait((image_path, capture_id, img_data))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            EVENT_LOG.log('upload_dropped', capture_id=capture_id, path=image_path,
+                          error="Upload queue full")
+            return False
+    
+    def pending(self):
+        """Number of uploads waiting to be sent."""
+        return self._queue.qsize()
+    
+    def _worker(self):
+        """Send queued uploads one at a time."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if not self._send_to_channel(*item):
+                self._send_to_webhook(*item)
+    
+    def _send_to_channel(self, image_path, capture_id=None, img_data=None):
+        """Send image over the persistent channel. Returns False if it is not connected."""
+        if self.channel is None or not self.channel.connected:
+            return False
+        if img_data is None:
+            with open(image_path, 'rb') as img_file:
+                img_data = img_file.read()
         
-        return len(faces) > 0
+        upload_start = time.time()
+        if capture_id:
+            LATENCY_TRACKER.upload_started(capture_id, upload_start)
+        if not self.channel.send_image(img_data, os.path.basename(image_path), capture_id):
+            return False
+        upload_end = time.time()
+        if capture_id:
+            LATENCY_TRACKER.upload_finished(capture_id, upload_end)
+        EVENT_LOG.log('upload', transport='tcp', capture_id=capture_id, bytes=len(img_data),
+                      upload_ms=round((upload_end - upload_start) * 1000.0, 1))
+        return True
     
-    def _send_to_webhook(self, image_path):
+    def _send_to_webhook(self, image_path, capture_id=None, img_data=None):
         """Send image to PC webhook server."""
         if not self.webhook_url:
-            print("  ⚠ Webhook URL not configured, skipping send")
+            EVENT_LOG.log('upload_error', capture_id=capture_id, error="Webhook URL not configured")
             return False
         
+        load_requests()
         try:
-            # Read image file and encode to base64
-            with open(image_path, 'rb') as img_file:
-                img_data = img_file.read()
-                img_base64 = base64.b64encode(img_data).decode('utf-8')
+            # Read image file unless the caller passed the bytes, and encode to base64
+            if img_data is None:
+                with open(image_path, 'rb') as img_file:
+                    img_data = img_file.read()
+            img_base64 = base64.b64encode(img_data).decode('utf-8')
             
-            # Prepare payload
+            # Prepare payload; the PC echoes capture_id back in its /message reply
             payload = {
                 'image': img_base64,
                 'filename': os.path.basename(image_path),
-                'timestamp': time.time()
+                'timestamp': time.time(),
+                'capture_id': capture_id
             }
             
-            print(f"  Sending image to PC: {self.webhook_url}")
-            
             # Send POST request to webhook
+            upload_start = time.time()
+            if capture_id:
+                LATENCY_TRACKER.upload_started(capture_id, upload_start)
             response = requests.post(
                 self.webhook_url,
                 json=payload,
                 timeout=30
             )
+            upload_end = time.time()
+            
+            upload_ms = round((upload_end - upload_start) * 1000.0, 1)
             
             if response.status_code == 200:
-                print(f"  ✓ Image sent to PC successfully")
+                if capture_id:
+                    LATENCY_TRACKER.upload_finished(capture_id, upload_end)
+                EVENT_LOG.log('upload', transport='http', capture_id=capture_id,
+                              bytes=len(img_data), upload_ms=upload_ms)
                 return True
             else:
-                print(f"  ✗ Webhook request failed with status {response.status_code}")
-                print(f"     Response: {response.text[:200]}")
+                EVENT_LOG.log('upload_error', transport='http', capture_id=capture_id,
+                              status=response.status_code, upload_ms=upload_ms,
+                              error=response.text[:200])
                 return False
                 
         except requests.exceptions.ConnectTimeout:
-            print(f"✗ Connection timeout: Cannot reach PC at {self.webhook_url}")
-            print(f"  Please check:")
-            print(f"  1. PC server is running (python pc_server.py)")
-            print(f"  2. PC IP address is correct: {PC_IP}")
-            print(f"  3. PC and autocar are on the same network")
-            print(f"  4. Firewall allows connections on port {PC_WEBHOOK_PORT}")
+            EVENT_LOG.log('upload_error', transport='http', capture_id=capture_id,
+                          error=f"Connection timeout: Cannot reach PC at {self.webhook_url}")
+            self._print_connection_help()
             return False
         except requests.exceptions.ConnectionError as e:
-            print(f"✗ Connection error: Cannot connect to PC at {self.webhook_url}")
-            print(f"  Error: {str(e)}")
-            print(f"  Please check:")
-            print(f"  1. PC server is running")
-            print(f"  2. PC IP address is correct")
-            print(f"  3. Test connection: ping {PC_IP} or curl http://{PC_IP}:{PC_WEBHOOK_PORT}/health")
+            EVENT_LOG.log('upload_error', transport='http', capture_id=capture_id,
+                          error=f"Cannot connect to PC at {self.webhook_url}: {str(e)}")
+            self._print_connection_help()
             return False
         except requests.exceptions.RequestException as e:
-            print(f"✗ Error sending to webhook: {str(e)}")
+            EVENT_LOG.log('upload_error', transport='http', capture_id=capture_id,
+                          error=f"Error sending to webhook: {str(e)}")
             return False
         except Exception as e:
-            print(f"✗ Unexpected error sending to webhook: {str(e)}")
+            EVENT_LOG.log('upload_error', transport='http', capture_id=capture_id,
+                          error=f"Unexpected error sending to webhook: {str(e)}")
             return False
     
-    def capture_image(self, frame):
-        """Capture and save the image."""
+    def _print_connection_help(self):
+        """Print the connection checklist the first time the PC cannot be reached."""
+        if self._help_shown:
+            return
+        self._help_shown = True
+        print(f"✗ Cannot reach PC at {self.webhook_url}")
+        print(f"  Please check:")
+        print(f"  1. PC server is running (python pc_server.py)")
+        print(f"  2. PC IP address is correct: {PC_IP}")
+        print(f"  3. PC and autocar are on the same network")
+        print(f"  4. Firewall allows connections on port {PC_WEBHOOK_PORT}")
+        print(f"  5. Test connection: ping {PC_IP} or curl http://{PC_IP}:{PC_WEBHOOK_PORT}/health")
+        print(f"  Further upload errors go to the event log ({EVENT_LOG.path or 'console summary'})")
+
+
+class DetectorPool:
+    """A fixed set of Haar cascades shared by all camera pipelines."""
+    
+    def __init__(self, size=DETECTOR_POOL_SIZE):
+        self.size = size
+        self._free = queue.Queue()
+        self.loaded = False
+    
+    def load(self):
+        """Initialize Haar Cascade face detectors."""
+        load_cv2()
+        for _ in range(self.size):
+            face_cascade = cv2.CascadeClassifier(HAAR_FACE_PATH)
+            if face_cascade.empty():
+                raise Exception("Failed to load face cascade classifier")
+            self._free.put(face_cascade)
+        self.loaded = True
+        print(f"Face detector initialized ({self.size} in pool)")
+    
+    def detect(self, gray, scale_factor, min_neighbors, min_size):
+        """Run detectMultiScale on a free cascade, waiting for one if all are busy."""
+        face_cascade = self._free.get()
+        try:
+            return face_cascade.detectMultiScale(
+                gray, 
+                scaleFactor=scale_factor,
+                minNeighbors=min_neighbors,
+                minSize=(min_size, min_size)
+            )
+        finally:
+            self._free.put(face_cascade)
+
+
+# ==================== FRAME POOL ====================
+class FramePool:
+    """Spare frame buffers for frames that must outlive one loop iteration."""
+    
+    def __init__(self, size=FRAME_POOL_SIZE):
+        self.size = size
+        self.allocated = 0
+        self._free = []
+        self._lock = threading.Lock()
+    
+    def acquire(self, like):
+        """Return a free buffer shaped like the given frame, allocating only if none fits."""
+        with self._lock:
+            for i, buffer in enumerate(self._free):
+                if buffer.shape == like.shape and buffer.dtype == like.dtype:
+                    return self._free.pop(i)
+            self.allocated += 1
+        return np.empty_like(like)
+    
+    def release(self, buffer):
+        """Give a buffer back; extras beyond the pool size are left to the GC."""
+        if buffer is None:
+            return
+        with self._lock:
+            if len(self._free) < self.size:
+                self._free.append(buffer)
+
+
+# ==================== BEST-FRAME SELECTION ====================
+def score_face(gray, face):
+    """
+    Score a detected face for capture quality.
+    
+    Args:
+        gray: Grayscale detection image
+        face: (x, y, w, h) box in gray coordinates
+        
+    Returns:
+        float: Higher for sharper (Laplacian variance of the face region),
+        larger and more centered faces
+    """
+    x, y, w, h = [int(v) for v in face]
+    frame_h, frame_w = gray.shape[:2]
+    sharpness = cv2.Laplacian(gray[y:y + h, x:x + w], cv2.CV_64F).var()
+    area = (w * h) / float(frame_w * frame_h)
+    offset_x = (x + w / 2.0) / frame_w - 0.5
+    offset_y = (y + h / 2.0) / frame_h - 0.5
+    centered = 1.0 - min(1.0, math.hypot(offset_x, offset_y) / math.hypot(0.5, 0.5))
+    return math.log1p(sharpness) * (1.0 + SELECTION_SIZE_WEIGHT * area) * (0.5 + 0.5 * centered)
+
+
+class BestFrameSelector:
+    """Keep the best-scoring frame seen during a short window after a detection."""
+    
+    def __init__(self, window=SELECTION_WINDOW, pool=None):
+        self.window = window
+        self.pool = pool  # Gets the frames this selector lets go of
+        self.windows = 0
+        self.frames_scored = 0
+        self._reset()
+    
+    def _reset(self):
+        self.started = None
+        self.first_detect_start = None
+        self.best_frame = None
+        self.best_score = None
+        self.best_detect_time = None
+        self.candidates = 0
+    
+    @property
+    def active(self):
+        return self.started is not None
+    
+    def offer(self, frame, score, detect_start, detect_time):
+        """
+        Consider a frame with a face; the window opens on the first one.
+        
+        Returns:
+            bool: True if the selector kept the frame. The caller must then
+            stop writing into it; the displaced frame goes back to the pool.
+        """
+        if self.started is None:
+            self.started = time.time()
+            self.first_detect_start = detect_start
+            self.windows += 1
+        self.candidates += 1
+        self.frames_scored += 1
+        if self.best_score is None or score > self.best_score:
+            if self.pool is not None:
+                self.pool.release(self.best_frame)
+            self.best_frame = frame
+            self.best_score = score
+            self.best_detect_time = detect_time
+            return True
+        return False
+    
+    def due(self):
+        """True once the window has run out and a frame is waiting to be saved."""
+        return self.started is not None and time.time() - self.started >= self.window
+    
+    def take(self):
+        """
+        Close the window.
+        
+        Returns:
+            dict: frame, score, candidates, detect_start (first detection),
+            detect_time (of the chosen frame) and select_time (window length)
+        """
+        best = {
+            'frame': self.best_frame,
+            'score': self.best_score,
+            'candidates': self.candidates,
+            'detect_start': self.first_detect_start,
+            'detect_time': self.best_detect_time,
+            'select_time': time.time() - self.started,
+        }
+        self._reset()
+        return best
+
+
+# ==================== FRAME GOVERNOR ====================
+class FrameGovernor:
+    """Pace the capture loop to a target FPS and/or a CPU duty-cycle budget."""
+    
+    def __init__(self, target_fps=TARGET_FPS, cpu_budget=CPU_BUDGET):
+        self.target_fps = target_fps
+        self.cpu_budget = cpu_budget
+        self.avg_work = None  # Smoothed per-frame processing time
+        self._deadline = None
+        self._window_start = time.time()
+        self._window_frames = 0
+        self._window_work = 0.0
+    
+    def pace(self, work_start):
+        """
+        Sleep for whatever is left of this frame's budget. Call at the end of
+        each iteration.
+        
+        Args:
+            work_start: time.time() when processing of this frame began (after
+                the camera read, so waiting for a frame is not counted as work)
+        """
+        now = time.time()
+        work = now - work_start
+        self.avg_work = work if self.avg_work is None else 0.8 * self.avg_work + 0.2 * work
+        self._window_frames += 1
+        self._window_work += work
+        
+        delay = 0.0
+        
+        # Target FPS: sleep until this frame's slot ends. The deadline advances
+        # by whole periods so oversleeping one frame is made up on the next.
+        if self.target_fps > 0:
+            period = 1.0 / self.target_fps
+            if self._deadline is None or now - self._deadline > period:
+                self._deadline = now  # Fell behind; don't try to catch up in a burst
+            self._deadline += period
+            delay = self._deadline - now
+        
+        # CPU budget: idle long enough that work / (work + idle) <= budget,
+        # using the smoothed work time so the pause follows detection cost
+        if 0 < self.cpu_budget < 1:
+            delay = max(delay, self.avg_work * (1 - self.cpu_budget) / self.cpu_budget)
+        
+        if delay > 0:
+            time.sleep(delay)
+    
+    def stats(self):
+        """Return achieved FPS and duty cycle since the previous call."""
+        now = time.time()
+        elapsed = now - self._window_start
+        stats = {
+            'achieved_fps': round(self._window_frames / elapsed, 1) if elapsed > 0 else 0.0,
+            'duty_cycle': round(self._window_work / elapsed, 3) if elapsed > 0 else 0.0,
+        }
+        self._window_start = now
+        self._window_frames = 0
+        self._window_work = 0.0
+        return stats
+
+
+# ==================== FACE DETECTION ====================
+class FaceCapture:
+    def __init__(self, init_devices=True, spec=None, detector=None, store=None, uploader=None):
+        """
+        Initialize the face capture system.
+        
+        Args:
+            init_devices: Open the camera and load the detector now. Pass False
+                to let run_startup_phases() do it in parallel with other work.
+            spec: Camera spec dict (see CAMERA_SPECS); missing keys use the
+                module settings
+            detector: Shared DetectorPool, or None to create one
+            store: Shared CaptureStore, or None to create one
+            uploader: Shared UploadQueue, or None to create one
+        """
+        spec = spec or {}
+        self.spec = spec
+        self.name = spec.get('name', 'camera')
+        self.width = spec.get('width', CAMERA_WIDTH)
+        self.height = spec.get('height', CAMERA_HEIGHT)
+        self.last_capture_time = 0
+        self.capture_interval = spec.get('capture_interval', CAPTURE_INTERVAL)
+        
+        # Services shared with other cameras when run by MultiCameraManager
+        self.owns_services = store is None
+        self.store = store or CaptureStore()
+        self.uploader = uploader or UploadQueue()
+        self.detector = detector or DetectorPool(size=1)
+        self.save_folder = self.store.save_folder
+        
+        pixel_format = spec.get('pixel_format', CAMERA_PIXEL_FORMAT)
+        if isinstance(spec.get('source'), int):
+            # A V4L2 device index opens without our pipeline and always delivers BGR
+            if spec.get('pixel_format', 'BGR') != 'BGR':
+                raise ValueError(f"Camera '{self.name}': a device index source delivers BGR "
+                                 f"frames, not {spec['pixel_format']!r}")
+            pixel_format = 'BGR'
+        elif isinstance(spec.get('source'), str) and 'pixel_format' not in spec:
+            # Custom pipelines are used as written, so the default format cannot be assumed
+            raise ValueError(f"Camera '{self.name}': a GStreamer source needs a 'pixel_format' "
+                             f"naming the format it ends in, one of {PIXEL_FORMATS}")
+        self.camera = CameraSupervisor(self.width, self.height, name=self.name,
+                                       fps=spec.get('fps', CAMERA_FPS),
+                                       pixel_format=pixel_format,
+                                       source=spec.get('source'))
+        self.frame_format = FrameFormat(pixel_format, spec.get('detect_scale', DETECT_SCALE))
+        # Buffers reused every frame; frames kept by the selector are swapped
+        # out for spare ones from the pool instead of being copied
+        self.frame_pool = FramePool()
+        self._frame_buffer = None
+        self._preview_buffer = None
+        self._color_buffer = None
+        self.selector = BestFrameSelector(spec.get('selection_window', SELECTION_WINDOW),
+                                          pool=self.frame_pool)
+        # (scale_factor, min_neighbors, min_face_size, detect_scale), swapped as one
+        self.detect_params = (DETECT_SCALE_FACTOR, DETECT_MIN_NEIGHBORS, DETECT_MIN_SIZE,
+                              self.frame_format.detect_scale)
+        self.jpeg_quality = JPEG_QUALITY
+        self.governor = FrameGovernor()
+        self.first_frame_reported = False
+        self.running = False
+        
+        # Per-camera throughput counters
+        self.frames = 0
+        self.read_failures = 0
+        self.dropped_uploads = 0
+        self._fps_frames = 0
+        self._fps_since = time.time()
+        
+        if init_devices:
+            # Initialize camera
+            self._init_camera()
+            
+            # Initialize face detection
+            self._init_face_detector()
+    
+    @property
+    def webhook_url(self):
+        return self.uploader.webhook_url
+    
+    @property
+    def image_counter(self):
+        return self.store.image_counter
+    
+    def _init_camera(self):
+        """Initialize camera using hardware-specific settings."""
+        # A camera that is not ready yet is retried by the supervisor from run()
+        camera = self.camera.start()
+        if camera is None:
+            print(f"⚠ Camera '{self.name}' not available yet, will keep retrying")
+            return
+        
+        actual_width = camera.get(cv2.CAP_PROP_FRAME_WIDTH)
+        actual_height = camera.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        print(f"Camera '{self.name}' initialized: {actual_width}x{actual_height}")
+    
+    def _init_face_detector(self):
+        """Initialize Haar Cascade face detector."""
+        if not self.detector.loaded:
+            self.detector.load()
+    
+    def apply_config(self, settings):
+        """Apply runtime settings from RuntimeConfig; takes effect on the next frame."""
+        # Values set in this camera's spec stay pinned for this camera
+        pinned = {name: self.spec[name] for name in ('capture_interval', 'selection_window', 'detect_scale')
+                  if name in self.spec}
+        settings = dict(settings, **pinned)
+        self.capture_interval = settings['capture_interval']
+        self.selector.window = settings['selection_window']
+        self.jpeg_quality = settings['jpeg_quality']
+        self.governor.target_fps = settings['target_fps']
+        self.governor.cpu_budget = settings['cpu_budget']
+        self.detect_params = (settings['scale_factor'], settings['min_neighbors'],
+                              settings['min_face_size'], settings['detect_scale'])
+    
+    def find_faces(self, frame):
+        """Return the detection image and the face boxes found in it."""
+        scale_factor, min_neighbors, min_face_size, detect_scale = self.detect_params
+        gray = self.frame_format.gray(frame, detect_scale)
+        min_size = max(1, int(min_face_size * detect_scale))
+        faces = self.detector.detect(gray, scale_factor=scale_factor,
+                                     min_neighbors=min_neighbors, min_size=min_size)
+        return gray, faces
+    
+    def detect_face(self, frame):
+        """Detect faces in the given frame."""
+        _, faces = self.find_faces(frame)
+        return len(faces) > 0
+    
+    def capture_image(self, frame, detect_start=None, detect_time=None, select_time=None, **details):
+        """
+        Capture and save the image.
+        
+        Args:
+            frame: Frame to save
+            detect_start: When detection started on the frame that began the capture
+            detect_time: Detection time of the saved frame, in seconds
+            select_time: Time spent in the best-frame window, in seconds
+            **details: Extra fields for the 'capture' event (e.g. candidates, score)
+        
+        Returns:
+            str: Path of the saved image, or None during the capture interval
+            or if the image could not be encoded or written
+        """
         current_time = time.time()
         
         # Check if enough time has passed since last capture
         if current_time - self.last_capture_time < self.capture_interval:
             return None
         
-        # Save the original frame
-        filename = f"{self.image_counter}.jpg"
-        filepath = os.path.join(self.save_folder, filename)
+        # Start tracking this capture through the round trip
+        capture_id = new_capture_id()
+        LATENCY_TRACKER.start(capture_id, detect_start or current_time)
+        if detect_time is not None:
+            LATENCY_TRACKER.record(capture_id, 'detect', detect_time)
+        if select_time is not None:
+            LATENCY_TRACKER.record(capture_id, 'select', select_time)
         
-        cv2.imwrite(filepath, frame)
-        print(f"Face captured and saved: {filepath}")
+        # Save the original frame, encoding it only once for disk and upload
+        encode_start = time.time()
+        color = self.frame_format.color(frame, self._color_buffer)
+        if color is not frame:
+            self._color_buffer = color
+        ret, encoded = cv2.imencode('.jpg', color, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ret:
+            EVENT_LOG.log('capture_error', camera=self.name, capture_id=capture_id,
+                          error="JPEG encoding failed")
+            return None
+        img_data = encoded.tobytes()
+        filepath = self.store.next_path()
+        saved = True
+        try:
+            self.store.write(filepath, img_data)
+        except OSError as e:
+            # A full or read-only disk must not stop the loop; the upload still goes out
+            saved = False
+            EVENT_LOG.log('capture_error', camera=self.name, capture_id=capture_id,
+                          path=filepath, error=f"Could not save image: {str(e)}")
+        encode_time = time.time() - encode_start
+        LATENCY_TRACKER.record(capture_id, 'encode', encode_time)
+        EVENT_LOG.log('capture', camera=self.name, capture_id=capture_id, path=filepath,
+                      saved=saved, bytes=len(img_data), encode_ms=round(encode_time * 1000.0, 1),
+                      detect_ms=round((detect_time or 0.0) * 1000.0, 1),
+                      select_ms=round((select_time or 0.0) * 1000.0, 1), **details)
         
-        # Send to webhook if configured
-        if self.webhook_url:
-            self._send_to_webhook(filepath)
+        # Send to the PC if configured; the upload thread does the network I/O
+        if self.uploader.enabled:
+            if not self.uploader.submit(filepath, capture_id, img_data):
+                self.dropped_uploads += 1
         
-        self.image_counter += 1
         self.last_capture_time = current_time
         
-        return filepath
+        return filepath if saved else None
+    
+    def stats(self):
+        """Return FPS since the previous call, drop counters and camera health."""
+        now = time.time()
+        elapsed = now - self._fps_since
+        fps = self._fps_frames / elapsed if elapsed > 0 else 0.0
+        self._fps_frames = 0
+        self._fps_since = now
+        stats = {
+            'fps': round(fps, 1),
+            'frames': self.frames,
+            'read_failures': self.read_failures,
+            'dropped_uploads': self.dropped_uploads,
+        }
+        stats.update(self.governor.stats())
+        stats.update(self.camera.stats())
+        return stats
+    
+    def _capture_best(self):
+        """Save the frame chosen by the selector and return its buffer to the pool."""
+        best = self.selector.take()
+        self.capture_image(best['frame'], best['detect_start'],
+                           best['detect_time'], best['select_time'],
+                           candidates=best['candidates'],
+                           score=round(float(best['score']), 1))
+        self.frame_pool.release(best['frame'])
     
     def run(self, show_preview=True):
         """Main loop to continuously detect faces and capture images."""
-        print("Starting face detection and capture system...")
+        print(f"Starting face detection and capture on camera '{self.name}'...")
         print(f"Images will be saved to: {self.save_folder}")
         print(f"Capture interval: {self.capture_interval} seconds")
         print(f"PC webhook: {self.webhook_url}")
-        print("Press 'q' to quit")
+        if show_preview:
+            print("Press 'q' to quit")
         
+        self.running = True
+        self.uploader.start()
         try:
-            while True:
-                # Read frame from camera
-                ret, frame = self.camera.read()
+            while self.running:
+                # Read frame from camera into the reused buffer; the supervisor
+                # rebuilds the pipeline on failure, so the loop just tries again
+                ret, frame = self.camera.read(self._frame_buffer)
                 
                 if not ret:
-                    print("Failed to read frame from camera")
-                    break
+                    self.read_failures += 1
+                    # No better frame can arrive while the camera is failing, and
+                    # reconnect waits can be long: save the selected frame now
+                    if self.selector.active:
+                        self._capture_best()
+                    continue
+                self._frame_buffer = frame
+                self.frames += 1
+                self._fps_frames += 1
+                work_start = time.time()
                 
                 # Detect face in the frame
-                face_detected = self.detect_face(frame)
+                detect_start = time.time()
+                gray, faces = self.find_faces(frame)
+                face_detected = len(faces) > 0
+                detect_time = time.time() - detect_start
+                if not self.first_frame_reported:
+                    self.first_frame_reported = True
+                    print(f"First frame processed {time.time() - PROCESS_START:.2f}s after launch")
+                
+                # If face detected and the cooldown is over, score the frame;
+                # the best one from the selection window gets captured
+                ready = time.time() - self.last_capture_time >= self.capture_interval
+                if face_detected and ready:
+                    largest = max(faces, key=lambda face: face[2] * face[3])
+                    if self.selector.offer(frame, score_face(gray, largest), detect_start, detect_time):
+                        # The selector owns this frame now; read the next one elsewhere
+                        self._frame_buffer = self.frame_pool.acquire(frame)
                 
-                # If face detected, capture the image
-                if face_detected:
-                    saved_path = self.capture_image(frame)
-                    if saved_path:
-                        print(f"✓ Face detected and captured!")
+                if self.selector.due():
+                    self._capture_best()
                 
                 # Show preview if enabled
                 if show_preview:
-                    display_frame = frame.copy()
+                    self._preview_buffer = self.frame_format.preview(frame, self._preview_buffer)
+                    display_frame = self._preview_buffer
                     status_text = "Face Detected!" if face_detected else "No Face"
                     cv2.putText(display_frame, status_text, (10, 30), 
                                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0) if face_detected else (0, 0, 255), 2)
                     
                     time_until_next = max(0, self.capture_interval - (time.time() - self.last_capture_time))
-                    if face_detected and time_until_next > 0:
+                    if self.selector.active:
+                        cv2.putText(display_frame, "Selecting best frame...", (10, 70), 
+                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
+                    elif face_detected and time_until_next > 0:
                         countdown_text = f"Next capture in: {time_until_next:.1f}s"
                         cv2.putText(display_frame, countdown_text, (10, 70), 
                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
@@ -434,20 +2194,137 @@ class FaceCapture:
                         print("Quit requested by user")
                         break
                 
-                time.sleep(0.01)
+                # Sleep only for what is left of this frame's time/CPU budget
+                self.governor.pace(work_start)
         
         except KeyboardInterrupt:
             print("\nInterrupted by user")
         
         finally:
+            self.running = False
             self.cleanup()
     
+    def stop(self):
+        """Ask the loop in run() to finish after the current frame."""
+        self.running = False
+    
     def cleanup(self):
         """Release resources and close windows."""
-        if self.camera is not None:
-            self.camera.release()
+        self.camera.release()
+        if self.owns_services:
+            cv2.destroyAllWindows()
+            self.uploader.stop()
+            print(f"System stopped. Total images captured: {self.image_counter - 1}")
+            EVENT_LOG.stop()
+        camera_stats = self.camera.stats()
+        governor_stats = self.governor.stats()
+        print(f"Camera '{self.name}' loop: {governor_stats['achieved_fps']} fps, "
+              f"duty cycle {governor_stats['duty_cycle'] * 100:.0f}% since last report")
+        print(f"Camera '{self.name}' frames: {self.frames}, read failures: {self.read_failures}, "
+              f"dropped uploads: {self.dropped_uploads}")
+        print(f"Camera '{self.name}' reconnects: {camera_stats['reconnects']}, "
+              f"downtime: {camera_stats['downtime']}s")
+        if self.owns_services:
+            LATENCY_TRACKER.print_report()
+
+
+# ==================== MULTI-CAMERA ====================
+class MultiCameraManager:
+    """Run one FaceCapture per camera spec with a shared detector pool, upload queue and store."""
+    
+    def __init__(self, specs=None):
+        specs = specs or CAMERA_SPECS
+        self.store = CaptureStore()
+        self.uploader = UploadQueue()
+        self.detector = DetectorPool(size=DETECTOR_POOL_SIZE or len(specs))
+        self.pipelines = [
+            FaceCapture(init_devices=False, spec=spec, detector=self.detector,
+                        store=self.store, uploader=self.uploader)
+            for spec in specs
+        ]
+    
+    @property
+    def webhook_url(self):
+        return self.uploader.webhook_url
+    
+    def apply_config(self, settings):
+        """Apply runtime settings to the uploader and every camera."""
+        self.uploader.apply_config(settings)
+        for pipeline in self.pipelines:
+            pipeline.apply_config(settings)
+    
+    def startup_phases(self):
+        """Startup work for run_startup_phases(): every camera plus the detector pool."""
+        phases = [(f"camera:{pipeline.name}", pipeline._init_camera) for pipeline in self.pipelines]
+        phases.append(('detector', self.detector.load))
+        return phases
+    
+    def stats(self):
+        """Return per-camera stats keyed by camera name."""
+        return {pipeline.name: pipeline.stats() for pipeline in self.pipelines}
+    
+    def print_stats(self):
+        """Print one line per camera with FPS and drops."""
+        for name, stats in self.stats().items():
+            print(f"  [{name}] {stats['fps']} fps, frames: {stats['frames']}, "
+                  f"read failures: {stats['read_failures']}, "
+                  f"dropped uploads: {stats['dropped_uploads']}, "
+                  f"reconnects: {stats['reconnects']}, "
+                  f"duty cycle: {stats['duty_cycle'] * 100:.0f}%")
+        print(f"  Uploads pending: {self.uploader.pending()}, images saved: {self.store.saved}")
+    
+    def _report_stats(self, stopped):
+        """Print camera stats every CAMERA_STATS_INTERVAL until stopped is set."""
+        while not stopped.wait(CAMERA_STATS_INTERVAL):
+            print("Camera stats:")
+            self.print_stats()
+    
+    def run(self, show_preview=True):
+        """Run every camera until interrupted."""
+        self.uploader.start()
+        
+        # A single camera keeps the preview window, which needs the main thread,
+        # so its stats come from a reporter thread instead
+        if len(self.pipelines) == 1:
+            reporter_stopped = threading.Event()
+            reporter = threading.Thread(target=self._report_stats, args=(reporter_stopped,),
+                                        name="camera-stats", daemon=True)
+            reporter.start()
+            try:
+                self.pipelines[0].run(show_preview=show_preview)
+            finally:
+                reporter_stopped.set()
+                self.shutdown()
+            return
+        
+        threads = []
+        for pipeline in self.pipelines:
+            thread = threading.Thread(target=pipeline.run, kwargs={'show_preview': False},
+                                      name=f"camera-{pipeline.name}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(CAMERA_STATS_INTERVAL)
+                print("Camera stats:")
+                self.print_stats()
+        except KeyboardInterrupt:
+            print("\nInterrupted by user")
+        finally:
+            for pipeline in self.pipelines:
+                pipeline.stop()
+            for thread in threads:
+                thread.join(timeout=5.0)
+            self.shutdown()
+    
+    def shutdown(self):
+        """Flush uploads and print the final report."""
         cv2.destroyAllWindows()
-        print(f"System stopped. Total images captured: {self.image_counter - 1}")
+        self.uploader.stop()
+        print(f"System stopped. Total images captured: {self.store.image_counter - 1}")
+        LATENCY_TRACKER.print_report()
+        EVENT_LOG.stop()
 
 
 # ==================== MAIN ====================
@@ -457,27 +2334,50 @@ def main():
     print("Autocar Main Program - All-in-One")
     print("=" * 60)
     
+    # Open the cameras, load the detectors, warm up TTS and bind the receiver
+    # at the same time instead of one after another
+    print("Starting up...")
+    manager = MultiCameraManager(CAMERA_SPECS)
+    RUNTIME_CONFIG.load()
+    RUNTIME_CONFIG.subscribe(manager.apply_config)
+    phases = manager.startup_phases() + [
+        ('tts', warm_up_tts),
+        ('receiver', bind_message_receiver),
+    ]
+    if manager.webhook_url:
+        phases.append(('requests', load_requests))
+    results = run_startup_phases(phases)
+    print()
+    
+    # Optional persistent channel; uploads fall back to HTTP while it is down
+    channel = None
+    if PC_TRANSPORT == "tcp":
+        channel = PersistentChannel(PC_IP, PC_CHANNEL_PORT, on_message=submit_channel_message)
+        manager.uploader.channel = channel
+        MESSAGE_QUEUE.start()
+        channel.start()
+        print(f"✓ Persistent channel to {PC_IP}:{PC_CHANNEL_PORT} (HTTP as fallback)")
+    
     # Start message receiver in background
-    print("Starting message receiver...")
-    message_thread = threading.Thread(target=start_message_receiver, daemon=True)
-    message_thread.start()
-    print("✓ Message receiver started (running in background)")
-    print(f"  Listening on port {MESSAGE_PORT} for messages from PC")
-    print(f"  PC will send messages to: http://<AUTOCAR_IP>:{MESSAGE_PORT}/message")
+    httpd = results['receiver']
+    if httpd is not None:
+        message_thread = threading.Thread(target=start_message_receiver, args=(httpd,), daemon=True)
+        message_thread.start()
+        print("✓ Message receiver started (running in background)")
+        print(f"  Listening on port {MESSAGE_PORT} for messages from PC")
+        print(f"  PC will send messages to: http://<AUTOCAR_IP>:{MESSAGE_PORT}/message")
     if TTS_AVAILABLE:
         print("  ✓ Text-to-speech enabled - will announce person detection")
     else:
         print("  ⚠ Text-to-speech disabled - install pyttsx3 to enable")
     print()
     
-    # Initialize and run face capture
-    print("Initializing face detection system...")
-    face_capture = FaceCapture()
-    print()
-    
-    face_capture.run(show_preview=True)
+    try:
+        manager.run(show_preview=True)
+    finally:
+        if channel is not None:
+            channel.stop()
 
 
 if __name__ == "__main__":
     main()
-
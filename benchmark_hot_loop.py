@@ -0,0 +1,247 @@
+"""
+Benchmark for the per-frame buffer handling in FaceCapture.run.
+Drives the real capture loop (best-frame selection, frame pool swaps, JPEG
+captures and the preview copy included) with a fake camera that plays back
+synthetic frames. The camera either honours read(out) like cv2.VideoCapture
+or returns a new array for every frame, so the two runs show what reading
+into the reused buffer saves.
+
+Memory is measured, not counted: numpy reports its allocations to tracemalloc,
+so the traced run shows how much memory each frame holds at its peak and
+whether memory keeps growing. RSS is read from /proc where available.
+
+Usage:
+    python3 benchmark_hot_loop.py
+    python3 benchmark_hot_loop.py --format BGR --frames 1000 --no-preview
+
+Needs OpenCV and numpy but no camera, display or detector.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import autocar_main
+
+# FaceCapture normally gets these from load_cv2(), which also needs the
+# autocar's pop library
+autocar_main.cv2 = cv2
+autocar_main.np = np
+autocar_main.EVENT_LOG.path = ''
+autocar_main.EVENT_LOG.summary_interval = 0
+
+
+class HeadlessCV2:
+    """cv2 with the window calls turned into no-ops, so the preview path runs without a display."""
+
+    def __getattr__(self, name):
+        return getattr(cv2, name)
+
+    def imshow(self, name, image):
+        pass
+
+    def waitKey(self, delay=0):
+        return -1
+
+    def destroyAllWindows(self):
+        pass
+
+
+class FakeCamera:
+    """Play back frames like cv2.VideoCapture and stop the capture loop after a set count."""
+
+    def __init__(self, frames, count, honour_out, on_frame=None):
+        self.frames = frames
+        self.count = count
+        self.honour_out = honour_out
+        self.on_frame = on_frame
+        self.capture = None
+        self.reads = 0
+
+    def read(self, out=None):
+        if self.reads >= self.count:
+            self.capture.stop()
+            return False, None
+        source = self.frames[self.reads % len(self.frames)]
+        self.reads += 1
+        if self.on_frame is not None:
+            self.on_frame(self.reads)
+        if self.honour_out and out is not None and out.shape == source.shape:
+            np.copyto(out, source)
+            return True, out
+        return True, source.copy()
+
+    def get(self, prop):
+        return 0
+
+    def release(self):
+        pass
+
+
+class FakeDetector:
+    """Report one face in alternating bursts of frames, like a person walking past."""
+
+    loaded = True
+
+    def __init__(self, width, height, burst=10):
+        self.box = (width // 3, height // 4, width // 3, height // 2)
+        self.burst = burst
+        self.calls = 0
+
+    def detect(self, gray, scale_factor, min_neighbors, min_size):
+        self.calls += 1
+        return [self.box] if (self.calls // self.burst) % 2 == 0 else []
+
+
+class MemoryProbe:
+    """
+    Sample tracemalloc and RSS at every frame boundary after the warm-up frames.
+
+    Growth is compared from the middle of the measured frames to the end:
+    buffers allocated before tracing started are invisible to tracemalloc, so
+    the first frames after it starts show their replacements as a one-off step.
+    """
+
+    def __init__(self, warmup, frames):
+        self.warmup = warmup
+        self.midpoint = warmup + frames // 2
+        self.frames = 0
+        self.peaks = []
+        self.mid_traced = None
+        self.mid_rss = None
+        self._frame_start = None
+
+    def __call__(self, reads):
+        if reads < self.warmup:
+            return
+        if reads == self.warmup:
+            tracemalloc.start()
+        else:
+            current, peak = tracemalloc.get_traced_memory()
+            if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+                self.peaks.append(peak - self._frame_start)
+                tracemalloc.reset_peak()
+            self.frames += 1
+        self._frame_start = tracemalloc.get_traced_memory()[0]
+        if reads == self.midpoint:
+            self.mid_traced = self._frame_start
+            self.mid_rss = rss_bytes()
+
+    def finish(self):
+        """Return (peak bytes per frame or None, traced growth, RSS growth or None) for the second half."""
+        # Taken at the last frame boundary; after run() the capture object
+        # still holds its final frame
+        current = self._frame_start
+        tracemalloc.stop()
+        rss = rss_bytes()
+        peak = sum(self.peaks) / float(len(self.peaks)) if self.peaks else None
+        rss_growth = rss - self.mid_rss if rss is not None and self.mid_rss is not None else None
+        return peak, current - self.mid_traced, rss_growth
+
+
+def rss_bytes():
+    """Resident set size of this process, or None where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def make_frames(width, height, pixel_format, count=8):
+    """Random frames in the layout the camera pipeline delivers."""
+    rng = np.random.RandomState(0)
+    if pixel_format == 'BGR':
+        shape = (height, width, 3)
+    elif pixel_format == 'I420':
+        shape = (height * 3 // 2, width)
+    else:
+        shape = (height, width)
+    return [rng.randint(0, 256, size=shape).astype(np.uint8) for _ in range(count)]
+
+
+def run_loop(args, frames, count, honour_out, probe=None):
+    """
+    Run FaceCapture.run over count frames.
+
+    Returns:
+        tuple: (seconds per frame, FaceCapture after the run)
+    """
+    with tempfile.TemporaryDirectory() as save_folder:
+        store = autocar_main.CaptureStore(save_folder=save_folder)
+        capture = autocar_main.FaceCapture(
+            init_devices=False,
+            spec={'pixel_format': args.format, 'width': args.width, 'height': args.height,
+                  'capture_interval': args.capture_interval,
+                  'selection_window': args.selection_window},
+            detector=FakeDetector(args.width, args.height), store=store,
+            uploader=autocar_main.UploadQueue(webhook_url=None))
+        capture.governor.target_fps = 0  # Run as fast as frames arrive
+        camera = FakeCamera(frames, count, honour_out, on_frame=probe)
+        camera.capture = capture
+        capture.camera.camera = camera
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            capture.run(show_preview=args.preview)
+        elapsed = time.perf_counter() - start
+    return elapsed / count, capture
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark capture loop buffer reuse")
+    parser.add_argument('--width', type=int, default=autocar_main.CAMERA_WIDTH)
+    parser.add_argument('--height', type=int, default=autocar_main.CAMERA_HEIGHT)
+    parser.add_argument('--format', default='BGR', choices=autocar_main.PIXEL_FORMATS)
+    parser.add_argument('--frames', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=50, help="Frames before memory is sampled")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="Timed runs per variant, alternating; the fastest run is reported")
+    parser.add_argument('--capture-interval', type=float, default=0.05)
+    parser.add_argument('--selection-window', type=float, default=0.01)
+    parser.add_argument('--no-preview', dest='preview', action='store_false',
+                        help="Leave out the preview copy")
+    args = parser.parse_args()
+
+    autocar_main.cv2 = HeadlessCV2()
+    frames = make_frames(args.width, args.height, args.format)
+    print(f"{args.width}x{args.height} {args.format}, {args.frames} frames, "
+          f"preview {'on' if args.preview else 'off'}")
+
+    variants = (('new array', False), ('read(out)', True))
+    for _, honour_out in variants:
+        run_loop(args, frames, min(args.frames, 50), honour_out)  # Warm up
+
+    # Time without tracing; alternate the variants so CPU frequency changes hit both alike
+    runs = {name: [] for name, _ in variants}
+    for _ in range(args.repeat):
+        for name, honour_out in variants:
+            runs[name].append(run_loop(args, frames, args.frames, honour_out)[0])
+
+    results = {}
+    for name, honour_out in variants:
+        probe = MemoryProbe(args.warmup, args.frames)
+        _, capture = run_loop(args, frames, args.warmup + args.frames, honour_out, probe)
+        peak, growth, rss_growth = probe.finish()
+        results[name] = min(runs[name])
+        stats = capture.stats()
+        print(f"  {name:<10} {results[name] * 1e6:8.1f} us/frame, "
+              f"peak {'n/a' if peak is None else f'{peak / 1e6:.2f} MB'} per frame, "
+              f"growth over the last {args.frames - args.frames // 2} frames: "
+              f"traced {growth / 1e3:+.1f} kB, "
+              f"RSS {'n/a' if rss_growth is None else f'{rss_growth / 1e6:+.1f} MB'}")
+        print(f"  {'':<10} {stats['frames']} frames read, {capture.store.saved} captures, "
+              f"{capture.frame_pool.allocated} pool buffers allocated")
+
+    print(f"  speedup    {results['new array'] / results['read(out)']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
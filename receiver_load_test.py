@@ -0,0 +1,265 @@
+"""
+Load test for the autocar message receiver.
+Starts the receiver from autocar_main.py on a loopback port with speech
+disabled, sends /message and /health requests at a chosen concurrency and
+rate, and reports throughput, latency percentiles and error rates.
+
+Examples:
+    python3 receiver_load_test.py --duration 10 --concurrency 8
+    python3 receiver_load_test.py --rate 200 --save baseline.json
+    python3 receiver_load_test.py --rate 200 --compare baseline.json
+
+No camera, PC or speaker is needed.
+"""
+
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+
+import autocar_main
+from autocar_main import percentile
+
+ENDPOINTS = ('/message', '/health')
+
+
+class NullWriter:
+    """Swallow the receiver's terminal output while the test runs."""
+    def write(self, text):
+        return len(text)
+    
+    def flush(self):
+        pass
+
+
+def start_receiver(queue_size, consumer_delay):
+    """Start the receiver on an ephemeral loopback port. Returns the port."""
+    autocar_main.TTS_AVAILABLE = False  # Never start speech during a load test
+    # Count events but write no file and print no summaries
+    autocar_main.EVENT_LOG.path = ''
+    autocar_main.EVENT_LOG.summary_interval = 0
+    
+    def handler(data, received_at):
+        autocar_main.process_message(data, received_at)
+        if consumer_delay:
+            time.sleep(consumer_delay)
+    
+    autocar_main.MESSAGE_QUEUE = autocar_main.MessageQueue(max_size=queue_size, handler=handler)
+    httpd = autocar_main.bind_message_receiver('127.0.0.1', 0)
+    if httpd is None:
+        raise SystemExit("Could not bind the message receiver")
+    thread = threading.Thread(target=autocar_main.start_message_receiver, args=(httpd,), daemon=True)
+    thread.start()
+    return httpd.server_address[1]
+
+
+def send_request(port, path, body):
+    """Send one request and return its HTTP status, or None on a connection error."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        if path == '/message':
+            conn.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+        else:
+            conn.request('GET', path)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    except (OSError, http.client.HTTPException):
+        return None
+    finally:
+        conn.close()
+
+
+def run_load(port, duration, concurrency, rate, health_ratio):
+    """
+    Drive the receiver from `concurrency` threads for `duration` seconds.
+    
+    With a rate, requests follow a fixed schedule and latency is measured
+    from the scheduled send time, so a slow server cannot hide its backlog.
+    Without one, each thread sends as fast as it gets replies.
+    
+    Returns:
+        dict: endpoint -> list of (status, latency_seconds)
+    """
+    samples = {path: [] for path in ENDPOINTS}
+    lock = threading.Lock()
+    interval = concurrency / float(rate) if rate else 0.0
+    start = time.time() + 0.1
+    end = start + duration
+    
+    def worker(index):
+        local = {path: [] for path in ENDPOINTS}
+        sent = 0
+        scheduled = start + index * interval / concurrency
+        while True:
+            if interval:
+                delay = scheduled - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                send_time = scheduled
+                scheduled += interval
+            else:
+                send_time = time.time()
+            if send_time >= end:
+                break
+            
+            # Spread health checks evenly: one every 1/health_ratio requests
+            is_health = int((sent + 1) * health_ratio) > int(sent * health_ratio)
+            path = '/health' if is_health else '/message'
+            body = json.dumps({
+                'message': f"Person: load test {index}-{sent}",
+                'source': 'load-test',
+                'timestamp': time.time(),
+            })
+            status = send_request(port, path, body)
+            local[path].append((status, time.time() - send_time))
+            sent += 1
+        
+        with lock:
+            for path in ENDPOINTS:
+                samples[path].extend(local[path])
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples, duration):
+    """Turn raw samples into throughput, status counts and latency percentiles."""
+    results = {}
+    for path, entries in samples.items():
+        if not entries:
+            continue
+        latencies = sorted(latency * 1000.0 for _, latency in entries)
+        ok = sum(1 for status, _ in entries if status == 200)
+        rejected = sum(1 for status, _ in entries if status == 429)
+        errors = len(entries) - ok - rejected
+        results[path] = {
+            'requests': len(entries),
+            'throughput': round(len(entries) / duration, 1),
+            'ok': ok,
+            'rejected': rejected,
+            'errors': errors,
+            'error_rate': round(errors / float(len(entries)), 4),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p90_ms': round(percentile(latencies, 90), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'max_ms': round(latencies[-1], 2),
+        }
+    return results
+
+
+def print_results(results, queue_metrics):
+    """Print one block per endpoint plus the receiver's own queue metrics."""
+    for path, stats in results.items():
+        print(f"{path}")
+        print(f"  requests:   {stats['requests']} ({stats['throughput']} req/s)")
+        print(f"  ok/429/err: {stats['ok']}/{stats['rejected']}/{stats['errors']} "
+              f"(error rate {stats['error_rate'] * 100:.2f}%)")
+        print(f"  latency:    p50={stats['p50_ms']}ms p90={stats['p90_ms']}ms "
+              f"p99={stats['p99_ms']}ms max={stats['max_ms']}ms")
+    print(f"Receiver queue: {queue_metrics}")
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare against saved results.
+    
+    Returns:
+        list: Regression descriptions (empty if within tolerance)
+    """
+    regressions = []
+    for path, base in baseline.get('results', {}).items():
+        current = results.get(path)
+        if current is None:
+            continue
+        if current['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{path} throughput {current['throughput']} < "
+                               f"baseline {base['throughput']} req/s")
+        if current['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{path} p99 {current['p99_ms']}ms > baseline {base['p99_ms']}ms")
+        if current['error_rate'] > base['error_rate'] + 0.01:
+            regressions.append(f"{path} error rate {current['error_rate']} > "
+                               f"baseline {base['error_rate']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the autocar message receiver")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to run")
+    parser.add_argument('--concurrency', type=int, default=4, help="Client threads")
+    parser.add_argument('--rate', type=float, default=0,
+                        help="Total requests per second (0 = as fast as possible)")
+    parser.add_argument('--health-ratio', type=float, default=0.1,
+                        help="Fraction of requests sent to /health")
+    parser.add_argument('--queue-size', type=int, default=autocar_main.MESSAGE_QUEUE_SIZE,
+                        help="Receiver message queue size")
+    parser.add_argument('--consumer-delay', type=float, default=0.0,
+                        help="Extra seconds of work per message in the consumer (simulates speech)")
+    parser.add_argument('--save', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Compare with results saved by --save")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed relative regression when comparing")
+    parser.add_argument('--show-output', action='store_true',
+                        help="Keep the receiver's terminal output")
+    args = parser.parse_args()
+    
+    port = start_receiver(args.queue_size, args.consumer_delay)
+    print(f"Receiver on 127.0.0.1:{port}; {args.concurrency} threads, "
+          f"rate {args.rate or 'unlimited'}, {args.duration}s")
+    
+    stdout = sys.stdout
+    if not args.show_output:
+        sys.stdout = NullWriter()
+    try:
+        samples = run_load(port, args.duration, args.concurrency, args.rate, args.health_ratio)
+    finally:
+        sys.stdout = stdout
+    
+    results = summarize(samples, args.duration)
+    queue_metrics = autocar_main.MESSAGE_QUEUE.metrics()
+    event_metrics = autocar_main.EVENT_LOG.metrics()
+    print_results(results, queue_metrics)
+    print(f"Event log: {event_metrics}")
+    
+    if args.save:
+        report = {
+            'timestamp': time.time(),
+            'config': {
+                'duration': args.duration,
+                'concurrency': args.concurrency,
+                'rate': args.rate,
+                'health_ratio': args.health_ratio,
+                'queue_size': args.queue_size,
+                'consumer_delay': args.consumer_delay,
+            },
+            'results': results,
+            'queue': queue_metrics,
+            'events': event_metrics,
+        }
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.save}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('config', {}).get('rate') != args.rate or \
+                baseline.get('config', {}).get('concurrency') != args.concurrency:
+            print("⚠ Baseline was recorded with a different rate or concurrency")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("✗ Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("✓ Within tolerance of baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,25 @@
 import cv2
 import os
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
 from pop import Util
 
 # Global camera instance
 _camera = None
 _image_counter = 1
 _save_folder = "captured_images"
+_camera_lock = threading.Lock()   # Serializes reads between callers and bursts
+_counter_lock = threading.Lock()  # Hands out image numbers in order
+
+# Background capture (see cap_burst / cap_cam_async)
+WRITER_THREADS = 2   # Threads encoding and writing JPEG files
+BURST_BUFFERS = 8    # Preallocated frames; bursts wait for one if all are in use
+_grab_pool = None    # Single thread that reads burst frames at the requested spacing
+_writer_pool = None
+_free_buffers = None
 
 def init_camera(width=640, height=480, save_folder="captured_images"):
     """
@@ -17,6 +31,7 @@ def init_camera(width=640, height=480, save_folder="captured_images"):
         save_folder: Folder to save images
     """
     global _camera, _save_folder, _image_counter
+    global _grab_pool, _writer_pool, _free_buffers
     
     _save_folder = save_folder
     
@@ -33,10 +48,27 @@ def init_camera(width=640, height=480, save_folder="captured_images"):
         print("Camera not found")
         return False
     
+    # Frame buffers and threads for bursts, allocated once up front
+    _free_buffers = queue.Queue()
+    for _ in range(BURST_BUFFERS):
+        _free_buffers.put(np.empty((height, width, 3), dtype=np.uint8))
+    _grab_pool = ThreadPoolExecutor(max_workers=1)
+    _writer_pool = ThreadPoolExecutor(max_workers=WRITER_THREADS)
+    
     print(f"Camera initialized: {width}x{height}")
     return True
 
 
+def _next_filepath():
+    """Reserve the next image number and return (filename, filepath)."""
+    global _image_counter
+    
+    with _counter_lock:
+        filename = f"{_image_counter}.jpg"
+        _image_counter += 1
+    return filename, os.path.join(_save_folder, filename)
+
+
 def cap_cam():
     """
     Capture a single image from the camera and save it.
@@ -49,26 +81,126 @@ def cap_cam():
         return None
     
     # Read frame
-    ret, frame = _camera.read()
+    with _camera_lock:
+        ret, frame = _camera.read()
     
     if not ret:
         print("Failed to capture image")
         return None
     
     # Save image
-    filename = f"{_image_counter}.jpg"
-    filepath = os.path.join(_save_folder, filename)
+    filename, filepath = _next_filepath()
     cv2.imwrite(filepath, frame)
     
     print(f"Image saved: {filepath}")
-    _image_counter += 1
     
     return filename
 
 
+def _write_frame(frame, filename, filepath, future):
+    """Encode and save one burst frame, then give its buffer back."""
+    try:
+        if cv2.imwrite(filepath, frame):
+            print(f"Image saved: {filepath}")
+            future.set_result(filename)
+        else:
+            print(f"Failed to save image: {filepath}")
+            future.set_result(None)
+    except Exception as e:
+        print(f"Failed to save image: {filepath} ({str(e)})")
+        future.set_result(None)
+    finally:
+        # The frame array becomes a free buffer again; if the camera delivered
+        # a different size than requested, the pool adopts the real size
+        _free_buffers.put(frame)
+
+
+def _run_burst(futures, spacing):
+    """Read one frame per future at the given spacing and queue the writes."""
+    start = time.time()
+    for i, future in enumerate(futures):
+        delay = start + i * spacing - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        
+        if not future.set_running_or_notify_cancel():
+            continue  # Cancelled by the caller
+        
+        buffer = _free_buffers.get()
+        try:
+            with _camera_lock:
+                ret, frame = _camera.read(buffer)
+            
+            if not ret:
+                print("Failed to capture image")
+                _free_buffers.put(buffer)
+                future.set_result(None)
+                continue
+            
+            filename, filepath = _next_filepath()
+            _writer_pool.submit(_write_frame, frame, filename, filepath, future)
+        except Exception as e:
+            # Resolve every future so callers waiting on result() are not left hanging
+            print(f"Failed to capture image ({str(e)}), ending burst")
+            _free_buffers.put(buffer)
+            future.set_result(None)
+            for remaining in futures[i + 1:]:
+                if remaining.set_running_or_notify_cancel():
+                    remaining.set_result(None)
+            return
+
+
+def cap_burst(count=3, spacing=0.1, callback=None):
+    """
+    Capture several images in the background without blocking the caller.
+    
+    Frames are read into preallocated buffers on a background thread, and the
+    JPEG encoding and disk writes happen on a writer pool.
+    
+    Args:
+        count: Number of images to take
+        spacing: Seconds between the reads
+        callback: Optional function called with the saved filename (or None
+            if that frame failed) as each image finishes
+        
+    Returns:
+        list: One concurrent.futures.Future per image, resolving to the saved
+        filename or None. Image numbers follow the order of the reads.
+    """
+    if _camera is None or not _camera.isOpened():
+        print("Camera not initialized. Call init_camera() first.")
+        return []
+    
+    futures = [Future() for _ in range(count)]
+    if callback is not None:
+        for future in futures:
+            future.add_done_callback(
+                lambda done: callback(None if done.cancelled() else done.result()))
+    
+    _grab_pool.submit(_run_burst, futures, spacing)
+    return futures
+
+
+def cap_cam_async(callback=None):
+    """
+    Capture a single image in the background.
+    Returns a Future resolving to the saved filename, or None if not initialized.
+    """
+    futures = cap_burst(1, 0, callback)
+    return futures[0] if futures else None
+
+
 def release_camera():
     """Release the camera when done."""
-    global _camera
+    global _camera, _grab_pool, _writer_pool
+    
+    # Let queued bursts and writes finish first
+    if _grab_pool is not None:
+        _grab_pool.shutdown(wait=True)
+        _grab_pool = None
+    if _writer_pool is not None:
+        _writer_pool.shutdown(wait=True)
+        _writer_pool = None
     
     if _camera is not None:
         _camera.release()
@@ -86,8 +218,11 @@ if __name__ == "__main__":
     
     # When person detected, capture image
     cap_cam()
-    cap_cam()
-    cap_cam()
+    
+    # Or take a burst in the background and keep the control loop running
+    futures = cap_burst(3, spacing=0.2)
+    for future in futures:
+        print(f"Burst image: {future.result()}")
     
     # Release when done
     release_camera()